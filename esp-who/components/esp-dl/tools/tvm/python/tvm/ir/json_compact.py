@@ -15,18 +15,43 @@
 # specific language governing permissions and limitations
 # under the License.
 """Tool to upgrade json from historical versions."""
+import base64
 import json
-import tvm.ir
-import tvm.runtime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def create_updater(node_map, from_ver, to_ver):
+
+def _loads(json_str):
+    """Parse json_str, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(json_str)
+    return json.loads(json_str)
+
+
+def _dumps(data, pretty=False):
+    """Serialize data, using orjson when available.
+
+    The output is compact unless pretty is set, in which case it is indented by two spaces.
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else None
+        return orjson.dumps(data, option=option).decode("utf-8")
+    if pretty:
+        return json.dumps(data, indent=2)
+    return json.dumps(data, separators=(",", ":"))
+
+
+def create_updater(node_map, from_ver, to_ver, attr_initializers=()):
     """Create an updater to update json loaded data.
 
     Parameters
     ----------
-    node_map : Map[str, Function]
-        Map from type_key to updating function
+    node_map : Map[str, Union[Function, Sequence[Function]]]
+        Map from type_key to updating function, or to a list or tuple
+        of updating functions applied in order
 
     from_ver : str
         Prefix of version that we can accept,
@@ -34,29 +59,118 @@ def create_updater(node_map, from_ver, to_ver):
     to_ver : str
         The target version.
 
+    attr_initializers : Sequence[Tuple[FrozenSet[str], str]]
+        Pairs of (type_keys, attr_key). Once node_map has been applied to a node,
+        attr_key is initialized to "0" if the node has one of the type_keys and
+        lacks the attribute. This lets the updates of later versions run in the
+        same walk over the nodes.
+
     Returns
     -------
     fupdater : function
         The updater function
     """
 
+    # Split the map once so the per-node loop does not need an isinstance check.
+    single_map = {k: v for k, v in node_map.items() if not isinstance(v, (list, tuple))}
+    multi_map = {k: tuple(v) for k, v in node_map.items() if isinstance(v, (list, tuple))}
+    attr_initializers = tuple(attr_initializers)
+    single_get = single_map.get
+    multi_get = multi_map.get
+
     def _updater(data):
+        # Checked once per json; the node updating functions rely on the node_map
+        # keys instead of re-checking their input for every node.
         assert data["attrs"]["tvm_version"].startswith(from_ver)
         nodes = data["nodes"]
         for idx, item in enumerate(nodes):
-            f = node_map.get(item["type_key"], None)
-            if isinstance(f, list):
-                for fpass in f:
-                    item = fpass(item, nodes)
-            elif f:
+            type_key = item["type_key"]
+            f = single_get(type_key)
+            if f:
                 item = f(item, nodes)
-            nodes[idx] = item
+                nodes[idx] = item
+            else:
+                fpasses = multi_get(type_key)
+                if fpasses:
+                    for fpass in fpasses:
+                        item = fpass(item, nodes)
+                    nodes[idx] = item
+            for type_keys, attr_key in attr_initializers:
+                if item["type_key"] in type_keys:
+                    attrs = item["attrs"]
+                    if attr_key not in attrs:
+                        attrs[attr_key] = "0"
         data["attrs"]["tvm_version"] = to_ver
         return data
 
     return _updater
 
 
+def create_attr_initializer(attr_initializers, from_ver, to_ver):
+    """Create an updater that fills in missing attributes on sets of node types.
+
+    Unlike :py:func:`create_updater`, there is no per-node dispatch: a single
+    scan over the nodes checks membership in the type_keys and sets the
+    attributes inline.
+
+    Parameters
+    ----------
+    attr_initializers : Sequence[Tuple[FrozenSet[str], str]]
+        Pairs of (type_keys, attr_key). attr_key is initialized to "0" on the
+        nodes with one of the type_keys that lack the attribute.
+
+    from_ver : str
+        Prefix of version that we can accept,
+
+    to_ver : str
+        The target version.
+
+    Returns
+    -------
+    fupdater : function
+        The updater function
+    """
+    attr_initializers = tuple(attr_initializers)
+
+    def _updater(data):
+        assert data["attrs"]["tvm_version"].startswith(from_ver)
+        for item in data["nodes"]:
+            for type_keys, attr_key in attr_initializers:
+                if item["type_key"] in type_keys:
+                    attrs = item["attrs"]
+                    if attr_key not in attrs:
+                        attrs[attr_key] = "0"
+        data["attrs"]["tvm_version"] = to_ver
+        return data
+
+    return _updater
+
+
+# Node types that gained a virtual_device_ attribute in v0.9.
+_VIRTUAL_DEVICE_TYPE_KEYS = frozenset(
+    [
+        # Base IR
+        "GlobalVar",
+        "relay.Var",
+        "relay.Function",
+        "relay.Tuple",
+        "relay.Call",
+        "relay.Let",
+        "relay.If",
+        "relay.TupleGetItem",
+        "relay.RefCreate",
+        "relay.RefRead",
+        "relay.RefWrite",
+        "relay.Match",
+        "relay.Constant",
+    ]
+)
+
+
+_ATTR_INITIALIZERS_07_08 = ((frozenset(["IRModule"]), "attrs"),)
+_ATTR_INITIALIZERS_08_09 = ((_VIRTUAL_DEVICE_TYPE_KEYS, "virtual_device_"),)
+
+
 def create_updater_08_to_09():
     """
     Create an update to upgrade json from v0.8 to v0.9
@@ -66,43 +180,162 @@ def create_updater_08_to_09():
     fupdater : function
         The updater function
     """
+    return create_attr_initializer(_ATTR_INITIALIZERS_08_09, "0.8", "0.9")
+
+
+def create_updater_07_to_08():
+    """Create an update to upgrade json from v0.7 to v0.8"""
+    return create_attr_initializer(_ATTR_INITIALIZERS_07_08, "0.7", "0.8")
+
+
+# Node updating functions used by the v0.6 -> v0.7 upgrade.
+def _ftype_var(item, nodes):
+    vindex = int(item["attrs"]["var"])
+    item["attrs"]["name_hint"] = nodes[vindex]["attrs"]["name"]
+    # set vindex to null
+    nodes[vindex]["type_key"] = ""
+    del item["attrs"]["var"]
+    # Only registered for relay.TypeVar and relay.GlobalTypeVar, so the type_key
+    # always carries the "relay." prefix and this runs without a per-node check.
+    item["type_key"] = item["type_key"][len("relay.") :]
+    return item
 
-    def _initialize_virtual_device(item, _):
-        if "virtual_device_" not in item["attrs"]:
-            item["attrs"]["virtual_device_"] = "0"
+
+def _rename(new_name):
+    def _convert(item, _):
+        item["type_key"] = new_name
         return item
 
-    node_map = {
-        # Base IR
-        "GlobalVar": _initialize_virtual_device,
-        "relay.Var": _initialize_virtual_device,
-        "relay.Function": _initialize_virtual_device,
-        "relay.Tuple": _initialize_virtual_device,
-        "relay.Call": _initialize_virtual_device,
-        "relay.Let": _initialize_virtual_device,
-        "relay.If": _initialize_virtual_device,
-        "relay.TupleGetItem": _initialize_virtual_device,
-        "relay.RefCreate": _initialize_virtual_device,
-        "relay.RefRead": _initialize_virtual_device,
-        "relay.RefWrite": _initialize_virtual_device,
-        "relay.Match": _initialize_virtual_device,
-        "relay.Constant": _initialize_virtual_device,
-    }
-
-    return create_updater(node_map, "0.8", "0.9")
+    return _convert
 
 
-def create_updater_07_to_08():
-    """Create an update to upgrade json from v0.7 to v0.8"""
+def _update_tir_var(new_name):
+    def _convert(item, _):
+        item["type_key"] = new_name
+        item["attrs"]["type_annotation"] = "0"
+        return item
 
-    def _initialize_module_attributes(item, _):
-        assert item["type_key"] == "IRModule", "Only initialize the attributes for IRModules"
-        if "attrs" not in item["attrs"]:
-            item["attrs"]["attrs"] = "0"
+    return _convert
+
+
+def _update_global_key(item, _):
+    if "global_key" in item:
+        item["repr_str"] = item["global_key"]
+        del item["global_key"]
+    return item
+
+
+class _StringNode(dict):
+    """A runtime.String node created during the upgrade, as opposed to one read from the input."""
+
+
+def _update_from_std_str(key):
+    def _convert(item, nodes):
+        str_val = item["attrs"][key]
+        # isdigit() also accepts non-ascii digits such as "\u00b2" that int() rejects
+        if str_val.isascii() and str_val.isdecimal():
+            sidx = int(str_val)
+            if sidx < len(nodes):
+                target = nodes[sidx]
+                if target.get("type_key") == "runtime.String" and not isinstance(
+                    target, _StringNode
+                ):
+                    # Already a reference to a string node, e.g. in partially upgraded json.
+                    return item
+        # Build the node that save_json(tvm.runtime.String(str_val)) would emit,
+        # without the FFI and json round-trip: printable ascii is kept as
+        # repr_str, anything else is base64 encoded, and empty strings carry
+        # no payload at all.
+        val = _StringNode(type_key="runtime.String")
+        if str_val:
+            if str_val.isascii() and str_val.isprintable():
+                val["repr_str"] = str_val
+            else:
+                val["repr_b64"] = base64.b64encode(str_val.encode("utf-8")).decode("ascii")
+        sidx = len(nodes)
+        nodes.append(val)
+        item["attrs"][key] = f"{sidx}"
         return item
 
-    node_map = {"IRModule": _initialize_module_attributes}
-    return create_updater(node_map, "0.7", "0.8")
+    return _convert
+
+
+_NODE_MAP_06_07 = {
+    # Base IR
+    "SourceName": _update_global_key,
+    "EnvFunc": _update_global_key,
+    "relay.Op": (_update_global_key, _rename("Op")),
+    "relay.TypeVar": (_ftype_var, _update_from_std_str("name_hint")),
+    "TypeVar": _update_from_std_str("name_hint"),
+    "relay.Id": (_update_from_std_str("name_hint"),),
+    "relay.GlobalTypeVar": (_ftype_var, _update_from_std_str("name_hint")),
+    "GlobalTypeVar": _update_from_std_str("name_hint"),
+    "relay.Type": _rename("Type"),
+    "relay.TupleType": _rename("TupleType"),
+    "relay.TypeConstraint": _rename("TypeConstraint"),
+    "relay.FuncType": _rename("FuncType"),
+    "relay.IncompleteType": _rename("IncompleteType"),
+    "relay.TypeRelation": _rename("TypeRelation"),
+    "relay.TypeCall": _rename("TypeCall"),
+    "relay.Constructor": _update_from_std_str("name_hint"),
+    "relay.Module": _rename("IRModule"),
+    "relay.SourceName": _rename("SourceName"),
+    "relay.Span": _rename("Span"),
+    "relay.GlobalVar": (_rename("GlobalVar"), _update_from_std_str("name_hint")),
+    "GlobalVar": _update_from_std_str("name_hint"),
+    "relay.Pass": _rename("transform.Pass"),
+    "relay.PassInfo": _rename("transform.PassInfo"),
+    "relay.PassContext": _rename("transform.PassContext"),
+    "relay.ModulePass": _rename("transform.ModulePass"),
+    "relay.Sequential": _rename("transform.Sequential"),
+    "StrMap": _rename("Map"),
+    # TIR
+    "Variable": (_update_tir_var("tir.Var"), _update_from_std_str("name")),
+    "SizeVar": (_update_tir_var("tir.SizeVar"), _update_from_std_str("name")),
+    "StringImm": (_rename("tir.StringImm"), _update_from_std_str("value")),
+    "Cast": _rename("tir.Cast"),
+    "Add": _rename("tir.Add"),
+    "Sub": _rename("tir.Sub"),
+    "Mul": _rename("tir.Mul"),
+    "Div": _rename("tir.Div"),
+    "Mod": _rename("tir.Mod"),
+    "FloorDiv": _rename("tir.FloorDiv"),
+    "FloorMod": _rename("tir.FloorMod"),
+    "Min": _rename("tir.Min"),
+    "Max": _rename("tir.Max"),
+    "EQ": _rename("tir.EQ"),
+    "NE": _rename("tir.NE"),
+    "LT": _rename("tir.LT"),
+    "LE": _rename("tir.LE"),
+    "GT": _rename("tir.GT"),
+    "GE": _rename("tir.GE"),
+    "And": _rename("tir.And"),
+    "Or": _rename("tir.Or"),
+    "Not": _rename("tir.Not"),
+    "Select": _rename("tir.Select"),
+    "BufferLoad": _rename("tir.BufferLoad"),
+    "Ramp": _rename("tir.Ramp"),
+    "Broadcast": _rename("tir.Broadcast"),
+    "Shuffle": _rename("tir.Shuffle"),
+    "Call": (_rename("tir.Call"), _update_from_std_str("name")),
+    "Let": _rename("tir.Let"),
+    "Any": _rename("tir.Any"),
+    "LetStmt": _rename("tir.LetStmt"),
+    "AssertStmt": _rename("tir.AssertStmt"),
+    "BufferStore": _rename("tir.BufferStore"),
+    "BufferRealize": _rename("tir.BufferRealize"),
+    "Allocate": _rename("tir.Allocate"),
+    "IfThenElse": _rename("tir.IfThenElse"),
+    "Evaluate": _rename("tir.Evaluate"),
+    "Prefetch": _rename("tir.Prefetch"),
+    "AttrStmt": (_rename("tir.AttrStmt"), _update_from_std_str("attr_key")),
+    "Layout": (_rename("tir.Layout"), _update_from_std_str("name")),
+    "Buffer": (
+        _rename("tir.Buffer"),
+        _update_from_std_str("name"),
+        _update_from_std_str("scope"),
+    ),
+}
 
 
 def create_updater_06_to_07():
@@ -113,131 +346,23 @@ def create_updater_06_to_07():
     fupdater : function
         The updater function
     """
+    return create_updater(_NODE_MAP_06_07, "0.6", "0.7")
 
-    def _ftype_var(item, nodes):
-        vindex = int(item["attrs"]["var"])
-        item["attrs"]["name_hint"] = nodes[vindex]["attrs"]["name"]
-        # set vindex to null
-        nodes[vindex]["type_key"] = ""
-        del item["attrs"]["var"]
-        assert item["type_key"].startswith("relay.")
-        item["type_key"] = item["type_key"][len("relay.") :]
-        return item
-
-    def _rename(new_name):
-        def _convert(item, _):
-            item["type_key"] = new_name
-            return item
 
-        return _convert
+# Updaters from each version straight to the latest one. Every upgrade step is
+# applied in a single walk over the nodes instead of one walk per version.
+_UPDATERS_TO_LATEST = {
+    "0.6": create_updater(
+        _NODE_MAP_06_07, "0.6", "0.9", _ATTR_INITIALIZERS_07_08 + _ATTR_INITIALIZERS_08_09
+    ),
+    "0.7": create_attr_initializer(
+        _ATTR_INITIALIZERS_07_08 + _ATTR_INITIALIZERS_08_09, "0.7", "0.9"
+    ),
+    "0.8": create_updater_08_to_09(),
+}
 
-    def _update_tir_var(new_name):
-        def _convert(item, _):
-            item["type_key"] = new_name
-            item["attrs"]["type_annotation"] = "0"
-            return item
 
-        return _convert
-
-    def _update_global_key(item, _):
-        if "global_key" in item:
-            item["repr_str"] = item["global_key"]
-            del item["global_key"]
-        return item
-
-    def _update_from_std_str(key):
-        def _convert(item, nodes):
-            str_val = item["attrs"][key]
-            jdata = json.loads(tvm.ir.save_json(tvm.runtime.String(str_val)))
-            root_idx = jdata["root"]
-            val = jdata["nodes"][root_idx]
-            sidx = len(nodes)
-            nodes.append(val)
-            item["attrs"][key] = f"{sidx}"
-            return item
-
-        return _convert
-
-    node_map = {
-        # Base IR
-        "SourceName": _update_global_key,
-        "EnvFunc": _update_global_key,
-        "relay.Op": [_update_global_key, _rename("Op")],
-        "relay.TypeVar": [_ftype_var, _update_from_std_str("name_hint")],
-        "TypeVar": _update_from_std_str("name_hint"),
-        "relay.Id": [_update_from_std_str("name_hint")],
-        "relay.GlobalTypeVar": [_ftype_var, _update_from_std_str("name_hint")],
-        "GlobalTypeVar": _update_from_std_str("name_hint"),
-        "relay.Type": _rename("Type"),
-        "relay.TupleType": _rename("TupleType"),
-        "relay.TypeConstraint": _rename("TypeConstraint"),
-        "relay.FuncType": _rename("FuncType"),
-        "relay.IncompleteType": _rename("IncompleteType"),
-        "relay.TypeRelation": _rename("TypeRelation"),
-        "relay.TypeCall": _rename("TypeCall"),
-        "relay.Constructor": _update_from_std_str("name_hint"),
-        "relay.Module": _rename("IRModule"),
-        "relay.SourceName": _rename("SourceName"),
-        "relay.Span": _rename("Span"),
-        "relay.GlobalVar": [_rename("GlobalVar"), _update_from_std_str("name_hint")],
-        "GlobalVar": _update_from_std_str("name_hint"),
-        "relay.Pass": _rename("transform.Pass"),
-        "relay.PassInfo": _rename("transform.PassInfo"),
-        "relay.PassContext": _rename("transform.PassContext"),
-        "relay.ModulePass": _rename("transform.ModulePass"),
-        "relay.Sequential": _rename("transform.Sequential"),
-        "StrMap": _rename("Map"),
-        # TIR
-        "Variable": [_update_tir_var("tir.Var"), _update_from_std_str("name")],
-        "SizeVar": [_update_tir_var("tir.SizeVar"), _update_from_std_str("name")],
-        "StringImm": [_rename("tir.StringImm"), _update_from_std_str("value")],
-        "Cast": _rename("tir.Cast"),
-        "Add": _rename("tir.Add"),
-        "Sub": _rename("tir.Sub"),
-        "Mul": _rename("tir.Mul"),
-        "Div": _rename("tir.Div"),
-        "Mod": _rename("tir.Mod"),
-        "FloorDiv": _rename("tir.FloorDiv"),
-        "FloorMod": _rename("tir.FloorMod"),
-        "Min": _rename("tir.Min"),
-        "Max": _rename("tir.Max"),
-        "EQ": _rename("tir.EQ"),
-        "NE": _rename("tir.NE"),
-        "LT": _rename("tir.LT"),
-        "LE": _rename("tir.LE"),
-        "GT": _rename("tir.GT"),
-        "GE": _rename("tir.GE"),
-        "And": _rename("tir.And"),
-        "Or": _rename("tir.Or"),
-        "Not": _rename("tir.Not"),
-        "Select": _rename("tir.Select"),
-        "BufferLoad": _rename("tir.BufferLoad"),
-        "Ramp": _rename("tir.Ramp"),
-        "Broadcast": _rename("tir.Broadcast"),
-        "Shuffle": _rename("tir.Shuffle"),
-        "Call": [_rename("tir.Call"), _update_from_std_str("name")],
-        "Let": _rename("tir.Let"),
-        "Any": _rename("tir.Any"),
-        "LetStmt": _rename("tir.LetStmt"),
-        "AssertStmt": _rename("tir.AssertStmt"),
-        "BufferStore": _rename("tir.BufferStore"),
-        "BufferRealize": _rename("tir.BufferRealize"),
-        "Allocate": _rename("tir.Allocate"),
-        "IfThenElse": _rename("tir.IfThenElse"),
-        "Evaluate": _rename("tir.Evaluate"),
-        "Prefetch": _rename("tir.Prefetch"),
-        "AttrStmt": [_rename("tir.AttrStmt"), _update_from_std_str("attr_key")],
-        "Layout": [_rename("tir.Layout"), _update_from_std_str("name")],
-        "Buffer": [
-            _rename("tir.Buffer"),
-            _update_from_std_str("name"),
-            _update_from_std_str("scope"),
-        ],
-    }
-    return create_updater(node_map, "0.6", "0.7")
-
-
-def upgrade_json(json_str):
+def upgrade_json(json_str, pretty=False):
     """Update json from a historical version.
 
     Parameters
@@ -245,20 +370,20 @@ def upgrade_json(json_str):
     json_str : str
         A historical json file.
 
+    pretty : bool
+        Whether to indent the output for human readers.
+        Compact output is cheaper to produce and to parse again.
+
     Returns
     -------
     updated_json : str
         The updated version.
     """
-    data = json.loads(json_str)
+    data = _loads(json_str)
     from_version = data["attrs"]["tvm_version"]
 
-    if from_version.startswith("0.6"):
-        data = create_updater_08_to_09()(create_updater_07_to_08()(create_updater_06_to_07()(data)))
-    elif from_version.startswith("0.7"):
-        data = create_updater_08_to_09()(create_updater_07_to_08()(data))
-    elif from_version.startswith("0.8"):
-        data = create_updater_08_to_09()(data)
-    else:
+    fupdater = _UPDATERS_TO_LATEST.get(from_version[:3])
+    if fupdater is None:
         raise ValueError(f"Cannot update from version {from_version}")
-    return json.dumps(data, indent=2)
+    data = fupdater(data)
+    return _dumps(data, pretty)
@@ -16,13 +16,34 @@
 # under the License.
 # pylint: disable=invalid-name, unused-argument
 """Extract information from the binary_elementwise operators in TIR."""
+from collections import namedtuple
 from typing import Tuple
 import tvm
-from .utils import get_outer_loops, get_op_attrs, get_loads
+from .utils import get_outer_loops, get_typed_op_attrs, get_loads
 from .dma import get_ifm_params, get_ofm_params
-from .spec import SerialActivation, SerialBinaryElementwise, SerialRescaleConfig
+from .spec import (
+    SerialActivation,
+    SerialBinaryElementwise,
+    SerialRescaleConfig,
+    get_shared_serial_object,
+)
 from .producers_consumers import ProducersConsumers
 
+BinaryElementwiseAttrs = namedtuple(
+    "BinaryElementwiseAttrs",
+    [
+        "reversed_operands",
+        "activation",
+        "clip_min",
+        "clip_max",
+        "use_rescale",
+        "rescale_scale",
+        "rescale_shift",
+        "operator_type",
+        "rounding_mode",
+    ],
+)
+
 
 def get_binary_elementwise_params(
     stmt: tvm.tir.AttrStmt, producers_consumers: ProducersConsumers
@@ -50,8 +71,8 @@ def get_binary_elementwise_params(
         Whether this operator allocates its output.
 
     """
-    attrs, body = get_op_attrs(stmt)
-    reversed_operands = attrs["reversed_operands"]
+    attrs, body = get_typed_op_attrs(stmt, BinaryElementwiseAttrs)
+    reversed_operands = attrs.reversed_operands
 
     _, _, _, _, _, inner = get_outer_loops(body, "NHWC")
     # loads = [input, input, LUT, LUT]
@@ -69,21 +90,24 @@ def get_binary_elementwise_params(
         output_pointer, producers_consumers, stmt
     )
     # Get activation info
-    serial_activation = SerialActivation(
-        op=attrs["activation"], clip_min=attrs["clip_min"], clip_max=attrs["clip_max"]
+    serial_activation = get_shared_serial_object(
+        SerialActivation, op=attrs.activation, clip_min=attrs.clip_min, clip_max=attrs.clip_max
     )
-    rescale_config = SerialRescaleConfig(
-        use_rescale=attrs["use_rescale"], scale=attrs["rescale_scale"], shift=attrs["rescale_shift"]
+    rescale_config = get_shared_serial_object(
+        SerialRescaleConfig,
+        use_rescale=attrs.use_rescale,
+        scale=attrs.rescale_scale,
+        shift=attrs.rescale_shift,
     )
     return (
         SerialBinaryElementwise(
             ifm=serial_ifm,
             ifm2=serial_ifm2,
             ofm=serial_ofm,
-            operator_type=attrs["operator_type"],
+            operator_type=attrs.operator_type,
             reversed_operands=reversed_operands,
             activation=serial_activation,
-            rounding_mode=attrs["rounding_mode"],
+            rounding_mode=attrs.rounding_mode,
             block_config=serial_block_config,
             rescale_config=rescale_config,
         ),
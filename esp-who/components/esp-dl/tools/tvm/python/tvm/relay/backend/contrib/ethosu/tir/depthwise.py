@@ -16,19 +16,36 @@
 # under the License.
 # pylint: disable=invalid-name, unused-argument
 """Extract information from the depthwise convolution operators in TIR."""
+from collections import namedtuple
 from typing import Tuple
 import tvm
 from ..vela_api import SCALE_BIAS_LENGTH
-from .utils import get_outer_loops, get_op_attrs, get_base_address, get_loads, get_stores
+from .utils import get_outer_loops, get_typed_op_attrs, get_base_address, get_loads, get_stores
 from .dma import get_ifm_params, get_ofm_params
 from .spec import (
     SerialKernel,
     SerialAddressRange,
     SerialActivation,
     Serial2DDepthwise,
+    get_shared_serial_object,
 )
 from .producers_consumers import ProducersConsumers
 
+DepthwiseConv2DAttrs = namedtuple(
+    "DepthwiseConv2DAttrs",
+    [
+        "stride_w",
+        "stride_h",
+        "dilation_w",
+        "dilation_h",
+        "activation",
+        "clip_min",
+        "clip_max",
+        "weight_zero_point",
+        "rounding_mode",
+    ],
+)
+
 
 def get_depthwise_conv2d_params(
     stmt: tvm.tir.AttrStmt, producers_consumers: ProducersConsumers
@@ -56,7 +73,7 @@ def get_depthwise_conv2d_params(
         Whether this operator allocates its output.
 
     """
-    attrs, body = get_op_attrs(stmt)
+    attrs, body = get_typed_op_attrs(stmt, DepthwiseConv2DAttrs)
     _, _, _, _, _, inner = get_outer_loops(body, "NHWC")
     rh = inner
     rw = rh.body
@@ -72,13 +89,14 @@ def get_depthwise_conv2d_params(
         output_pointer, producers_consumers, stmt
     )
     # Get kernel info
-    serial_kernel = SerialKernel(
+    serial_kernel = get_shared_serial_object(
+        SerialKernel,
         width=int(rw.extent),
         height=int(rh.extent),
-        stride_w=int(attrs["stride_w"]),
-        stride_h=int(attrs["stride_h"]),
-        dilation_w=int(attrs["dilation_w"]),
-        dilation_h=int(attrs["dilation_h"]),
+        stride_w=int(attrs.stride_w),
+        stride_h=int(attrs.stride_h),
+        dilation_w=int(attrs.dilation_w),
+        dilation_h=int(attrs.dilation_h),
     )
     # Get scale_bias info
     scale_bias_load = loads[3]
@@ -95,8 +113,8 @@ def get_depthwise_conv2d_params(
         length=serial_ofm[3] * serial_kernel[0] * serial_kernel[1],
     )
     # Get activation info
-    serial_activation = SerialActivation(
-        op=attrs["activation"], clip_min=attrs["clip_min"], clip_max=attrs["clip_max"]
+    serial_activation = get_shared_serial_object(
+        SerialActivation, op=attrs.activation, clip_min=attrs.clip_min, clip_max=attrs.clip_max
     )
 
     return (
@@ -105,11 +123,11 @@ def get_depthwise_conv2d_params(
             ofm=serial_ofm,
             kernel=serial_kernel,
             weight=serial_weight,
-            weight_zero_point=attrs["weight_zero_point"],
+            weight_zero_point=attrs.weight_zero_point,
             scale_bias=serial_scale_bias,
             padding=serial_padding,
             activation=serial_activation,
-            rounding_mode=attrs["rounding_mode"],
+            rounding_mode=attrs.rounding_mode,
             upscale="NONE",
             block_config=serial_block_config,
         ),
@@ -16,6 +16,7 @@
 # under the License.
 # pylint: disable=invalid-name, unused-argument
 """The ProducersConsumers class"""
+from bisect import bisect_right
 from typing import Optional
 from collections.abc import KeysView
 import tvm
@@ -28,13 +29,17 @@ class ProducersConsumers:
     def __init__(self) -> None:
         self.indices: dict[tvm.tir.AttrStmt, int] = {}
         self.producers: list[(tvm.tir.AttrStmt, tvm.tir.expr.Var)] = []
+        # Increasing indices into self.producers of the statements producing each variable
+        self.producer_indices: dict[tvm.tir.expr.Var, list[int]] = {}
         self.consumers: list[(tvm.tir.AttrStmt, list[tvm.tir.expr.Var])] = []
         self.allocate_variables: Optional[KeysView] = None
 
     def add_producer(self, var: tvm.tir.expr.Var, attr: tvm.tir.AttrStmt) -> None:
         """Add the attribute statement attr as producer of the variable var."""
-        self.indices[attr] = len(self.producers)
+        index = len(self.producers)
+        self.indices[attr] = index
         self.producers.append((attr, var))
+        self.producer_indices.setdefault(var, []).append(index)
 
     def get_producer(
         self, var: tvm.tir.expr.Var, attr: tvm.tir.AttrStmt
@@ -44,11 +49,14 @@ class ProducersConsumers:
         if var not in self.allocate_variables:
             return None
 
-        index = self.indices[attr]
-        for i in list(reversed(range(index + 1))):
-            if self.producers[i][1] == var:
-                return self.producers[i][0]
-        return None
+        producer_indices = self.producer_indices.get(var)
+        if not producer_indices:
+            return None
+
+        position = bisect_right(producer_indices, self.indices[attr])
+        if position == 0:
+            return None
+        return self.producers[producer_indices[position - 1]][0]
 
     def get_last_producer(self, var: tvm.tir.expr.Var) -> Optional[tvm.tir.AttrStmt]:
         """Get the last attribute statement which produces the variable var."""
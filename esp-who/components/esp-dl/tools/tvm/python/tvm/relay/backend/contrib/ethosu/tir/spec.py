@@ -15,6 +15,7 @@
 # specific language governing permissions and limitations
 # under the License.
 """The TIR serialization specification for Arm(R) Ethos(TM)-U NPU."""
+from collections import OrderedDict
 from typing import Union
 from typing import get_type_hints
 from inspect import isclass
@@ -62,6 +63,60 @@ def create_serial_object(serialized_type, deserialized_elements):
     return _create_serial_object(serialized_type)[0]
 
 
+# Shared instances of serial objects made of constants, see get_shared_serial_object.
+# The least recently used entries are evicted once the cache holds _SHARED_SERIAL_OBJECTS_SIZE
+# objects, so compiling many models does not grow it without bound.
+_SHARED_SERIAL_OBJECTS: "OrderedDict[tuple, SerializableFormat]" = OrderedDict()
+_SHARED_SERIAL_OBJECTS_SIZE = 1024
+
+
+def _constant_key(value):
+    """Get a hashable key identifying a constant by value rather than by handle."""
+    if isinstance(value, (tvm.tir.IntImm, tvm.tir.FloatImm)):
+        return (type(value), value.dtype, value.value)
+    if isinstance(value, tvm.tir.StringImm):
+        return (type(value), value.value)
+    return (type(value), value)
+
+
+def get_shared_serial_object(serialized_type, **kwargs):
+    """
+    This function returns an instance of serialized_type constructed from kwargs,
+    reusing a previously constructed instance when the arguments have the same values.
+    Many operators of a network share e.g. the same activation or kernel configuration,
+    so this avoids building an identical object for each of them.
+
+    The returned objects are shared, hence they must not be modified.
+
+    Parameters
+    ----------
+    serialized_type : a subclass type of SerializableFormat
+
+    kwargs : dict
+        The constant arguments to construct the object with
+
+    Returns
+    -------
+    The object of type serialized_type
+    """
+    try:
+        key = (serialized_type,) + tuple(
+            (name, _constant_key(value)) for name, value in kwargs.items()
+        )
+        serial_object = _SHARED_SERIAL_OBJECTS.get(key)
+    except TypeError:
+        # Unhashable arguments, don't share the object
+        return serialized_type(**kwargs)
+    if serial_object is None:
+        serial_object = serialized_type(**kwargs)
+        _SHARED_SERIAL_OBJECTS[key] = serial_object
+        if len(_SHARED_SERIAL_OBJECTS) > _SHARED_SERIAL_OBJECTS_SIZE:
+            _SHARED_SERIAL_OBJECTS.popitem(last=False)
+    else:
+        _SHARED_SERIAL_OBJECTS.move_to_end(key)
+    return serial_object
+
+
 class SerializableFormat:
     """Base class to retrieve arguments on a predefined ordering"""
 
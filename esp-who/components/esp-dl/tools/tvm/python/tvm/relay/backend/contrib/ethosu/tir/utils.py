@@ -16,10 +16,19 @@
 # under the License.
 # pylint: disable=invalid-name
 """Helper utility functions used by the NPU TIR compiler"""
+import functools
+
 import tvm
 from tvm import arith
 
+# The same loop nest is often inspected several times, e.g. an IFM read nest
+# is parsed by get_read_params and again by create_tiles. TIR objects hash by
+# identity and the cache keeps them alive, so the statement-keyed helpers below
+# memoize their results. Callers must treat the returned dicts/lists as read-only.
+_STMT_CACHE_SIZE = 1024
+
 
+@functools.lru_cache(maxsize=_STMT_CACHE_SIZE)
 def get_op_attrs(stmt):
     """Iterate through nested attribute statements accumulating their values
     in an attribute dictionary.
@@ -50,6 +59,29 @@ def get_op_attrs(stmt):
     return attrs, stmt
 
 
+@functools.lru_cache(maxsize=_STMT_CACHE_SIZE)
+def get_typed_op_attrs(stmt, attrs_type):
+    """Collect the attributes of an operator into a namedtuple.
+
+    Parameters
+    ----------
+    stmt : tvm.tir.AttrStmt
+        The outermost attribute statement to begin from.
+    attrs_type : type
+        The namedtuple type to build, one field per attribute to extract.
+
+    Returns
+    -------
+    attrs : attrs_type
+        The requested attributes.
+    stmt : tvm.tir.Stmt
+        The body after having collected the final attribute statement.
+
+    """
+    attrs, body = get_op_attrs(stmt)
+    return attrs_type._make(attrs[field] for field in attrs_type._fields), body
+
+
 def get_strides(index, stride_vars):
     """Get the striding of given vars in an indexing expression.
 
@@ -115,6 +147,7 @@ def get_base_address(index):
     return base_address
 
 
+@functools.lru_cache(maxsize=_STMT_CACHE_SIZE)
 def get_outer_loops(stmt, layout):
     """Get the outer loops of an operator.
 
@@ -188,6 +221,7 @@ def collect_buffer_map(stmt):
     return buffer_map
 
 
+@functools.lru_cache(maxsize=_STMT_CACHE_SIZE)
 def get_loads(stmt):
     """Get the BufferLoad statements.
 
@@ -212,6 +246,7 @@ def get_loads(stmt):
     return loads
 
 
+@functools.lru_cache(maxsize=_STMT_CACHE_SIZE)
 def get_stores(stmt):
     """Get the BufferStore statements.
 
@@ -16,12 +16,20 @@
 # under the License.
 # pylint: disable=unused-argument, not-context-manager
 """Automatic convert model from dense to block sparse"""
+from collections import OrderedDict
 
+import tvm
 from tvm import relay
 from tvm.relay.analysis.sparse_conv2d import process_params
 
 from .utils import _run_opt_pass
 
+# LRU cache of convert_cached results, keyed by the structural hash of func and the conversion
+# options. Each entry keeps func to confirm hash matches with structural_equal. Entries hold the
+# converted func and its sparse weights, so only the most recently used few are kept.
+_CONVERT_CACHE_CAPACITY = 8
+_CONVERT_CACHE = OrderedDict()  # type: ignore
+
 
 def convert(func, params, blocksize, sparsity_threshold, layout="NHWC", kernel_size=1):
     """Convert a conv2d func and according parameters to block sparse
@@ -49,6 +57,13 @@ def convert(func, params, blocksize, sparsity_threshold, layout="NHWC", kernel_s
     params: Dict[Srting, tvm.nd.array]
         New params with BSR matrix for mutated Expr
     """
+    new_func, _ = _convert_with_info(
+        func, params, blocksize, sparsity_threshold, layout, kernel_size
+    )
+    return new_func, params
+
+
+def _convert_with_info(func, params, blocksize, sparsity_threshold, layout, kernel_size):
     weight_info = process_params(func, params, blocksize, sparsity_threshold, layout, kernel_size)
     new_func = _run_opt_pass(
         func,
@@ -56,7 +71,88 @@ def convert(func, params, blocksize, sparsity_threshold, layout="NHWC", kernel_s
             weight_info.weight_name, weight_info.weight_shape, layout, kernel_size
         ),
     )
+    return new_func, weight_info
+
+
+def convert_cached(func, params, blocksize, sparsity_threshold, layout="NHWC", kernel_size=1):
+    """Same as :py:func:`convert`, but reuses the result of previous calls with the same func.
+
+    The sparsity analysis of the weights and the rewrite of func are done once per
+    structurally equal func and conversion options. Later calls apply the cached
+    sparse weights to params, register the cached sparse weights as auto_scheduler
+    task inputs again and return the cached func. The params are not hashed:
+    callers must pass the same weights whenever they pass the same func, as it is
+    the case when a tuner converts the same model repeatedly.
+
+    Parameters
+    ----------
+    func : relay.Expr
+        Expr will be optimized to sparse operation
+    params : Dict[Srting, tvm.nd.array]
+        Parameters of the Expr
+    blocksize : Tuple(int, int)
+        Blocksize for BSR matrix
+    sparsity_threshold : float
+        Minimal sparsity requirement for converting.
+        If weight sparsity is lower than this threshold,
+        the dense operation will be kept.
+    layout : str
+        layout of network
+    kernel_size : int
+        kernel size of the conv2d, for filtering
+
+    Returns
+    -------
+    new_func: relay.Expr
+        Mutated Expr with sparse operations
+
+    params: Dict[Srting, tvm.nd.array]
+        New params with BSR matrix for mutated Expr
+    """
+    # pylint: disable=import-outside-toplevel
+    from tvm.auto_scheduler.search_task import (
+        TASK_INPUT_BUFFER_TABLE,
+        register_task_input_buffer,
+    )  # lazily import to avoid recursive dependency
+
+    key = (
+        tvm.ir.structural_hash(func),
+        tuple(blocksize),
+        sparsity_threshold,
+        layout,
+        kernel_size,
+    )
+    cached = _CONVERT_CACHE.get(key)
+    # The hash only selects a candidate, a collision must not return another func's conversion
+    if cached is None or not tvm.ir.structural_equal(cached[0], func):
+        registered = dict(TASK_INPUT_BUFFER_TABLE.get("default", {}))
+        new_func, weight_info = _convert_with_info(
+            func, params, blocksize, sparsity_threshold, layout, kernel_size
+        )
+        dense_names = [str(name) for name in weight_info.weight_name]
+        sparse_params = {
+            name + suffix: params[name + suffix]
+            for name in dense_names
+            for suffix in (".data", ".indices", ".indptr")
+        }
+        task_inputs = {
+            name: data
+            for name, data in TASK_INPUT_BUFFER_TABLE.get("default", {}).items()
+            if registered.get(name) is not data
+        }
+        _CONVERT_CACHE[key] = (func, new_func, dense_names, sparse_params, task_inputs)
+        if len(_CONVERT_CACHE) > _CONVERT_CACHE_CAPACITY:
+            _CONVERT_CACHE.popitem(last=False)
+        return new_func, params
 
+    _CONVERT_CACHE.move_to_end(key)
+    _, new_func, dense_names, sparse_params, task_inputs = cached
+    for name in dense_names:
+        params.pop(name, None)
+    params.update(sparse_params)
+    # The task input table may have been cleared since the conversion was cached
+    for name, data in task_inputs.items():
+        register_task_input_buffer("default", name, data, overwrite=True)
     return new_func, params
 
 
@@ -16,10 +16,44 @@
 # under the License.
 # pylint: disable=invalid-name
 """The relay parser."""
+from collections import OrderedDict
+
+from tvm.ir import load_json, save_json
 from . import _ffi_api_parser
 
+# LRU cache of modules parsed without an initial module or meta table, keyed by
+# (source, source_name). Modules are stored serialized, so every hit loads an
+# independent module with the same source map as a fresh parse. A text seen once
+# is only recorded as None, and serialized when it is parsed the second time,
+# so parsing a text once costs no more than an uncached parse.
+_PARSE_CACHE_CAPACITY = 64
+_PARSE_CACHE = OrderedDict()  # type: ignore
+
+
+def _as_text(source):
+    if isinstance(source, (bytes, bytearray)):
+        return source.decode("utf-8")
+    return source
+
 
 def parse(source, source_name="from_string", init_module=None, init_meta_table=None):
+    source = _as_text(source)
+    if init_module is None and not init_meta_table:
+        key = (source, source_name)
+        seen = key in _PARSE_CACHE
+        cached = _PARSE_CACHE.get(key)
+        if cached is not None:
+            _PARSE_CACHE.move_to_end(key)
+            return load_json(cached)
+        mod = _ffi_api_parser.ParseModuleInContext(  # type: ignore # pylint: disable=no-member
+            source_name, source, None, {}
+        )
+        _PARSE_CACHE[key] = save_json(mod) if seen else None
+        _PARSE_CACHE.move_to_end(key)
+        if len(_PARSE_CACHE) > _PARSE_CACHE_CAPACITY:
+            _PARSE_CACHE.popitem(last=False)
+        return mod
+
     if init_meta_table is None:
         init_meta_table = {}
     return _ffi_api_parser.ParseModuleInContext(  # type: ignore # pylint: disable=no-member
@@ -31,7 +65,9 @@ def parse(source, source_name="from_string", init_module=None, init_meta_table=N
 
 
 def parse_expr(source):
-    return _ffi_api_parser.ParseExpr("string", source)  # type: ignore # pylint: disable=no-member
+    return _ffi_api_parser.ParseExpr(  # type: ignore # pylint: disable=no-member
+        "string", _as_text(source)
+    )
 
 
 def fromtext(source, source_name="from_string"):
@@ -15,15 +15,35 @@
 # specific language governing permissions and limitations
 # under the License.
 
-# pylint: disable=redefined-builtin, wildcard-import
+# pylint: disable=redefined-builtin
 """Qualcomm Adreno GPU specific declaration and schedules."""
-from .conv2d_nchw import *
-from .depthwise_conv2d_nchw import *
-from .conv2d_nhwc import *
-from .depthwise_conv2d_nhwc import *
-from .pooling import *
-from .conv2d_alter_op import *
-from .conv2d_nchw_winograd import *
-from .conv2d_nhwc_winograd import *
+from .conv2d_nchw import conv2d_nchwc, schedule_conv2d_nchwc, schedule_conv2d_NCHWc_KCRSk
+from .depthwise_conv2d_nchw import (
+    depthwise_conv2d_nchwc,
+    schedule_depthwise_conv2d_nchwc,
+    schedule_depthwise_conv2d_NCHWc_KCRSk,
+)
+from .conv2d_nhwc import conv2d_nhwc, schedule_conv2d_nhwc, schedule_conv2d_NHWC
+from .depthwise_conv2d_nhwc import (
+    depthwise_conv2d_nhwc,
+    schedule_depthwise_conv2d_nhwc,
+    schedule_depthwise_conv2d_NHWC_HWOI,
+)
+from .pooling import schedule_adaptive_pool, schedule_pool
+from . import conv2d_alter_op  # registers the conv2d layout alteration for adreno
+from .conv2d_nchw_winograd import (
+    conv2d_nchw_winograd,
+    schedule_conv2d_nchw_winograd,
+    conv2d_nchw_winograd_without_weight_transform,
+    schedule_conv2d_nchw_winograd_without_weight_transform,
+    conv2d_nchw_winograd_comp,
+)
+from .conv2d_nhwc_winograd import (
+    conv2d_nhwc_winograd,
+    schedule_conv2d_nhwc_winograd,
+    conv2d_nhwc_winograd_without_weight_transform,
+    schedule_conv2d_nhwc_winograd_without_weight_transform,
+    conv2d_nhwc_winograd_comp,
+)
 from .injective import schedule_injective
-from .reduction import *
+from .reduction import schedule_reduce
@@ -25,6 +25,23 @@ from ..utils import get_const_tuple
 from ..nn import qnn_conv2d_alter_layout, add_alter_layout, qnn_requantize_alter_layout
 
 
+def prev_ops_collect(curr_op: relay.expr.Call, pattern: Iterable[str]):
+    """Returns the nested Relay operators matching a pattern, or None if they do not match.
+
+    Walks the operators the same way as `prev_ops_match`, and returns them in the order of
+    `pattern` (i.e. backwards, starting with `curr_op`) so callers do not have to walk the chain a
+    second time.
+    """
+    ops = []
+    prev_op = curr_op
+    for op_name in pattern:
+        if (not hasattr(prev_op, "op")) or prev_op.op.name != op_name:
+            return None
+        ops.append(prev_op)
+        prev_op = prev_op.args[0]
+    return ops
+
+
 def prev_ops_match(curr_op: relay.expr.Call, pattern: Iterable[str]):
     """Checks if the names of nested Relay operators match a pattern.
 
@@ -32,12 +49,7 @@ def prev_ops_match(curr_op: relay.expr.Call, pattern: Iterable[str]):
     when traversing backwards. `pattern` should be an Iterable of operator names, written backwards
     from last to first.
     """
-    prev_op = curr_op
-    for op_name in pattern:
-        if (not hasattr(prev_op, "op")) or prev_op.op.name != op_name:
-            return False
-        prev_op = prev_op.args[0]
-    return True
+    return prev_ops_collect(curr_op, pattern) is not None
 
 
 def edit_attrs(attrs, **kwargs):
@@ -29,14 +29,32 @@ It would eventually be nice to have a generalized, cross-target solution for rem
 as there is no downside. This may be possible with Relax, but I'm unsure.
 """
 
+import functools
+
 import numpy as np
-from scipy.signal import convolve2d
 from tvm.topi.utils import get_const_tuple
 from tvm import nd, relay
-from .qnn_alter_op import prev_ops_match, edit_attrs
+from .qnn_alter_op import prev_ops_collect, edit_attrs
 from ..nn import bias_add_legalize
 
 
+@functools.lru_cache(maxsize=32)
+def _constant_numpy(constant):
+    """Read-only NumPy copy of a relay.Constant's data.
+
+    Each rewrite reads the same constants several times (once to find the fixed channels, again to
+    excise them), so the NDArray -> NumPy copies are cached on the constant node.
+    """
+    array = constant.data.numpy()
+    array.flags.writeable = False
+    return array
+
+
+def _constant_scalar(constant):
+    """The Python scalar held by a single-element relay.Constant, e.g. a zero point or a scale."""
+    return _constant_numpy(constant).item()
+
+
 def _compute_fixed_conv2d_outputs(requantize_op):
     """Compute all conv2d output values that do not depend on the layer input.
 
@@ -61,28 +79,54 @@ def _compute_fixed_conv2d_outputs(requantize_op):
 
     assert conv2d_op.attrs.kernel_layout.isalpha()
     assert conv2d_op.attrs.groups == 1
-    kernel = conv2d_op.args[1].data.numpy()
+    kernel = _constant_numpy(conv2d_op.args[1])
     oc_axis = conv2d_op.attrs.kernel_layout.index("O")
 
-    num_channels = kernel.shape[oc_axis]
-    rq_input_scale = requantize_op.args[1].data.numpy()
-    rq_output_scale = requantize_op.args[3].data.numpy().item()
-    rq_output_zero_point = requantize_op.args[4].data.numpy().item()
-    bias_data = bias_add_op.args[1].data.numpy()
-
-    fixed_outputs = {}
+    rq_input_scale = _constant_numpy(requantize_op.args[1])
+    rq_output_scale = _constant_scalar(requantize_op.args[3])
+    rq_output_zero_point = _constant_scalar(requantize_op.args[4])
+    bias_data = _constant_numpy(bias_add_op.args[1])
 
-    for i in range(num_channels):
-        if np.any(np.take(kernel, i, axis=oc_axis)):
-            continue
-        scale = rq_input_scale[i] / rq_output_scale
-        channel_constant = round(bias_data[i] * scale + rq_output_zero_point)
-        clipped = min(127, max(-128, channel_constant))
-        fixed_outputs[i] = clipped
+    # One pass over the whole kernel finds the output channels whose weights are all zero, and the
+    # constant each of them requantizes to is computed for all of them at once
+    other_axes = tuple(axis for axis in range(kernel.ndim) if axis != oc_axis)
+    empty_channels = np.flatnonzero(~kernel.any(axis=other_axes))
+    scales = rq_input_scale[empty_channels] / rq_output_scale
+    channel_constants = np.rint(bias_data[empty_channels] * scales + rq_output_zero_point)
+    clipped = np.clip(channel_constants, -128, 127).astype("int32")
+    fixed_outputs = dict(zip(empty_channels.tolist(), clipped.tolist()))
 
     return fixed_outputs
 
 
+def _same_mode_window(size):
+    """Bounds of the kernel taps overlapping each output position of a "same" mode convolution
+    whose input is as large as the kernel."""
+    end = np.arange(size) + (size - 1) // 2
+    return np.clip(end - size + 1, 0, size), np.clip(end + 1, 0, size)
+
+
+def _constant_input_partial_sums(kernel_channels):
+    """Compute convolve2d(np.ones(kernel.shape), kernel, mode="same") for a stack of kernels.
+
+    Every output entry is the sum of the kernel taps that overlap the (constant) input, so we read
+    these box sums off a summed-area table of each kernel instead of running a full convolution.
+    `kernel_channels` has shape (..., rows, cols), and so does the result.
+    """
+    rows, cols = kernel_channels.shape[-2:]
+    table = np.zeros(kernel_channels.shape[:-2] + (rows + 1, cols + 1), dtype="int32")
+    table[..., 1:, 1:] = kernel_channels.astype("int32").cumsum(axis=-2).cumsum(axis=-1)
+    row_lo, row_hi = _same_mode_window(rows)
+    col_lo, col_hi = _same_mode_window(cols)
+    row_lo, row_hi = row_lo[:, np.newaxis], row_hi[:, np.newaxis]
+    return (
+        table[..., row_hi, col_hi]
+        - table[..., row_lo, col_hi]
+        - table[..., row_hi, col_lo]
+        + table[..., row_lo, col_lo]
+    )
+
+
 def _compute_fixed_depthwise_outputs(requantize_op, fixed_channel_inputs):
     """Compute all depthwise conv2d output values that do not depend on the PREVIOUS layer input.
 
@@ -118,41 +162,70 @@ def _compute_fixed_depthwise_outputs(requantize_op, fixed_channel_inputs):
 
     assert depthwise_op.attrs.kernel_layout.isalpha()
     assert depthwise_op.attrs.groups > 1
-    kernel = depthwise_op.args[1].data.numpy()
+    kernel = _constant_numpy(depthwise_op.args[1])
     oc_axis = depthwise_op.attrs.kernel_layout.index("O")
 
-    conv_input_zero_point = depthwise_op.args[2].data.numpy().item()
-    rq_input_scale = requantize_op.args[1].data.numpy()
-    rq_output_scale = requantize_op.args[3].data.numpy().item()
-    rq_output_zero_point = requantize_op.args[4].data.numpy().item()
-    bias_data = bias_add_op.args[1].data.numpy()
+    conv_input_zero_point = _constant_scalar(depthwise_op.args[2])
+    rq_input_scale = _constant_numpy(requantize_op.args[1])
+    rq_output_scale = _constant_scalar(requantize_op.args[3])
+    rq_output_zero_point = _constant_scalar(requantize_op.args[4])
+    bias_data = _constant_numpy(bias_add_op.args[1])
 
     kernel_size = get_const_tuple(depthwise_op.attrs.kernel_size)
-    fixed_outputs = {}
+    num_fixed = len(fixed_channel_inputs)
+    channels = np.fromiter(fixed_channel_inputs.keys(), dtype="intp", count=num_fixed)
+    inputs = np.fromiter(fixed_channel_inputs.values(), dtype="int32", count=num_fixed)
+
+    # All channels are checked at once, as a stack of (kernel_size) planes. Moving the output
+    # channels to the front makes each plane contiguous.
+    kernel_channels = np.moveaxis(kernel, oc_axis, 0).reshape((-1,) + kernel_size)[channels]
+    scales = (rq_input_scale[channels] / rq_output_scale)[:, np.newaxis, np.newaxis]
+    biases = bias_data[channels][:, np.newaxis, np.newaxis]
+
+    # The input windows are constant, so each convolution is that constant times a map of partial
+    # kernel sums
+    convolved = (inputs - conv_input_zero_point)[:, np.newaxis, np.newaxis] * (
+        _constant_input_partial_sums(kernel_channels)
+    )
+    requantized = (convolved + biases) * scales
+    np.rint(requantized, out=requantized)
+    requantized += rq_output_zero_point
+    np.clip(requantized, -128, 127, out=requantized)
+
+    # We require the ENTIRE padded convolution to all have the same clipped value before we do
+    # a replacement. This is excessive - we only have to check for the padding that will
+    # actually be performed on the depthwise convolution, which is often less. If we felt even
+    # more ambitious, we could do the replacement for "close enough" looking convolution
+    # outputs, which in theory could reduce accuracy but in practice does not. Doing this would
+    # yield a ~0.5% speed gain on MobileNetV1, and nothing on other models.
+    planes = requantized.reshape(num_fixed, int(np.prod(kernel_size)))
+    is_fixed = (planes == planes[:, :1]).all(axis=1)
+    fixed_values = planes[is_fixed, 0].astype("int32")
+    fixed_outputs = dict(zip(channels[is_fixed].tolist(), fixed_values.tolist()))
 
-    for i, fixed_input in fixed_channel_inputs.items():
-        input_array = np.full(kernel_size, fixed_input, dtype="int32") - conv_input_zero_point
-        kernel_channel = np.take(kernel, i, axis=oc_axis).reshape(kernel_size)
-        scale = rq_input_scale[i] / rq_output_scale
+    # TODO @guberti look for all-zero entries in the depthwise kernel. I don't think these really
+    # occur in practice, but it would be nice for theoretical completeness.
 
-        convolved = convolve2d(input_array, kernel_channel, mode="same")
-        rounded = np.around((convolved + bias_data[i]) * scale).astype("int32")
-        clipped = np.clip(rounded + rq_output_zero_point, -128, 127)
+    return fixed_outputs
 
-        # We require the ENTIRE padded convolution to all have the same clipped value before we do
-        # a replacement. This is excessive - we only have to check for the padding that will
-        # actually be performed on the depthwise convolution, which is often less. If we felt even
-        # more ambitious, we could do the replacement for "close enough" looking convolution
-        # outputs, which in theory could reduce accuracy but in practice does not. Doing this would
-        # yield a ~0.5% speed gain on MobileNetV1, and nothing on other models.
 
-        if np.all(clipped == clipped[0, 0]):
-            fixed_outputs[i] = clipped[0, 0]
+def _remove_channels(array, channels, axis=0):
+    """Remove the given indices along `axis` of `array`.
 
-    # TODO @guberti look for all-zero entries in the depthwise kernel. I don't think these really
-    # occur in practice, but it would be nice for theoretical completeness.
+    The common case of a single contiguous run of channels is cut out with two slices, which copies
+    the kept data as two contiguous blocks. Anything else goes through a boolean mask.
+    """
+    channels = sorted(channels)
+    if channels and channels[-1] - channels[0] + 1 == len(channels):
+        head = [slice(None)] * array.ndim
+        tail = [slice(None)] * array.ndim
+        head[axis] = slice(None, channels[0])
+        tail[axis] = slice(channels[-1] + 1, None)
+        return np.concatenate((array[tuple(head)], array[tuple(tail)]), axis=axis)
 
-    return fixed_outputs
+    keep = np.ones(array.shape[axis], dtype=bool)
+    keep[channels] = False
+    return np.compress(keep, array, axis=axis)
 
 
 def _excise_conv2d_channels(empty_channels, input_op, requantize_op, is_depthwise=False):
@@ -160,10 +233,11 @@ def _excise_conv2d_channels(empty_channels, input_op, requantize_op, is_depthwis
     conv2d_op = bias_add_op.args[0]
     axis = conv2d_op.attrs.kernel_layout.index("O")
 
-    kernel_data = np.delete(conv2d_op.args[1].data.numpy(), empty_channels, axis=axis)
-    bias_data = np.delete(bias_add_op.args[1].data.numpy(), empty_channels)
-    in_scale_data = np.delete(conv2d_op.args[5].data.numpy(), empty_channels)
-    out_scale_data = np.delete(requantize_op.args[1].data.numpy(), empty_channels)
+    kernel = _constant_numpy(conv2d_op.args[1])
+    kernel_data = _remove_channels(kernel, empty_channels, axis=axis)
+    bias_data = _remove_channels(_constant_numpy(bias_add_op.args[1]), empty_channels)
+    in_scale_data = _remove_channels(_constant_numpy(conv2d_op.args[5]), empty_channels)
+    out_scale_data = _remove_channels(_constant_numpy(requantize_op.args[1]), empty_channels)
     num_channels = kernel_data.shape[axis]
     if is_depthwise:
         num_groups = num_channels
@@ -210,22 +284,22 @@ def _fold_into_conv_bias(fixed_inputs, conv2d_op, input_op):
     in_axis = conv2d_op.attrs.kernel_layout.index("I")
     out_axis = conv2d_op.attrs.kernel_layout.index("O")
 
-    kernel = conv2d_op.args[1].data.numpy()
-    zero_point = conv2d_op.args[2].data.numpy().item()
-
-    extra_bias = np.zeros((kernel.shape[out_axis],), dtype="int32")
+    kernel = _constant_numpy(conv2d_op.args[1])
+    zero_point = _constant_scalar(conv2d_op.args[2])
 
-    # For every output channel
-    for i in range(kernel.shape[out_axis]):
-        out_kernel_slice = np.expand_dims(np.take(kernel, i, axis=out_axis), axis=out_axis)
-
-        # For every input channel that is being removed:
-        for j, val in fixed_inputs.items():
-            kernel_slice = np.take(out_kernel_slice, j, axis=in_axis)
-            accumulator = np.sum(kernel_slice * (val - zero_point))
-            extra_bias[i] += accumulator
+    # Gather the kernel entries of the removed input channels as (out, removed, spatial), then
+    # contract them with the fixed input values in a single call.
+    fixed_channels = list(fixed_inputs.keys())
+    fixed_values = np.array(list(fixed_inputs.values()), dtype="int32") - zero_point
+    fixed_kernel = np.moveaxis(
+        np.take(kernel, fixed_channels, axis=in_axis), (out_axis, in_axis), (0, 1)
+    )
+    out_channels = kernel.shape[out_axis]
+    spatial_size = kernel.size // (out_channels * kernel.shape[in_axis])
+    fixed_kernel = fixed_kernel.reshape(out_channels, len(fixed_channels), spatial_size)
+    extra_bias = np.einsum("ojk,j->o", fixed_kernel.astype("int32"), fixed_values, dtype="int32")
 
-    stripped_kernel = np.delete(kernel, tuple(fixed_inputs.keys()), axis=in_axis)
+    stripped_kernel = _remove_channels(kernel, fixed_channels, axis=in_axis)
     new_conv = relay.qnn.op.conv2d(
         input_op,
         relay.Constant(nd.array(stripped_kernel)),
@@ -237,23 +311,19 @@ def _fold_into_conv_bias(fixed_inputs, conv2d_op, input_op):
 
 
 def _fold_into_dense_bias(fixed_inputs, dense_op, input_op, channel_axis=1):
-    weights = dense_op.args[1].data.numpy()
+    weights = _constant_numpy(dense_op.args[1])
     assert channel_axis < 2
     assert len(weights.shape) == 2
-    zero_point = dense_op.args[2].data.numpy().item()
-
-    extra_bias = np.zeros((weights.shape[1 - channel_axis],), dtype="int32")
-
-    # For every output channel
-    for i in range(weights.shape[1 - channel_axis]):
-        out_weights_slice = np.take(weights, i, axis=1 - channel_axis)
+    zero_point = _constant_scalar(dense_op.args[2])
 
-        # For every input channel that is being removed:
-        for j, val in fixed_inputs.items():
-            weight = out_weights_slice[j]
-            extra_bias[i] += (val - zero_point) * weight
+    # The contribution of the removed input channels is a single matrix-vector product
+    fixed_channels = list(fixed_inputs.keys())
+    fixed_values = np.array(list(fixed_inputs.values()), dtype="int32") - zero_point
+    fixed_weights = np.take(weights, fixed_channels, axis=channel_axis)
+    fixed_weights = np.moveaxis(fixed_weights, channel_axis, 0)
+    extra_bias = fixed_values @ fixed_weights.astype("int32")
 
-    stripped_weights = np.delete(weights, tuple(fixed_inputs.keys()), axis=channel_axis)
+    stripped_weights = _remove_channels(weights, fixed_channels, axis=channel_axis)
     new_dense = relay.qnn.op.dense(
         input_op,
         relay.Constant(nd.array(stripped_weights)),
@@ -264,17 +334,15 @@ def _fold_into_dense_bias(fixed_inputs, dense_op, input_op, channel_axis=1):
     return new_dense, extra_bias
 
 
-def _densify_conv_depthwise_conv_pattern(attrs, inputs):
+def _densify_conv_depthwise_conv_pattern(attrs, inputs, ops):
     """Rewrites a regular -> depthwise -> regular convolution pattern to excise empty out channels.
 
     Should be called as part of legalization (before dtypes and layouts are rewritten) and with the
-    BIAS ADD OPERATOR'S (the one we'll use to "fold in" our constants) `attrs` and `inputs`. The
-    last regular conv2d operator must be unpadded.
+    BIAS ADD OPERATOR'S (the one we'll use to "fold in" our constants) `attrs` and `inputs`, along
+    with the operators matched by `prev_ops_collect`. The last regular conv2d operator must be
+    unpadded.
     """
-    current_conv = inputs[0]
-    depthwise_requantize = current_conv.args[0]
-    top_requantize = depthwise_requantize.args[0].args[0].args[0]
-    top_conv2d = top_requantize.args[0].args[0]
+    current_conv, depthwise_requantize, _, _, top_requantize, _, top_conv2d = ops
 
     fixed_conv2d_outputs = _compute_fixed_conv2d_outputs(top_requantize)
     fixed_dw_outputs = _compute_fixed_depthwise_outputs(depthwise_requantize, fixed_conv2d_outputs)
@@ -293,27 +361,27 @@ def _densify_conv_depthwise_conv_pattern(attrs, inputs):
     )
     new_conv, extra_bias = _fold_into_conv_bias(fixed_dw_outputs, current_conv, new_dw_conv2d)
 
-    new_bias = inputs[1].data.numpy() + extra_bias
+    new_bias = _constant_numpy(inputs[1]) + extra_bias
     new_op = relay.nn.bias_add(new_conv, relay.Constant(nd.array(new_bias)), **attrs)
     return new_op
 
 
-def _densify_conv_pool_dense_pattern(attrs, inputs):
+def _densify_conv_pool_dense_pattern(attrs, inputs, ops):
     """Rewrites a regular conv -> pool -> dense pattern to excise empty out channels from the conv.
 
     Should be called as part of legalization (before dtypes and layouts are rewritten) and with the
-    BIAS ADD operator's `attrs` and `inputs` (the one we'll use to "fold in" our constants). The
-    average pool operator must reduce the height and width dimensions to 1x1.
+    BIAS ADD operator's `attrs` and `inputs` (the one we'll use to "fold in" our constants), along
+    with the operators matched by `prev_ops_collect`. The average pool operator must reduce the
+    height and width dimensions to 1x1.
     """
-    first_reshape = inputs[0].args[0]
-    top_requantize = first_reshape.args[0].args[0].args[0].args[0].args[0]
-    top_conv2d = top_requantize.args[0].args[0]
+    dense, first_reshape, _, _, _, _, top_requantize, _, top_conv2d = ops
 
     fixed_conv2d_outputs = _compute_fixed_conv2d_outputs(top_requantize)
 
-    # Ensure number of channels is divisible by two
+    # Ensure number of channels is divisible by two. Dicts pop in LIFO order, so this always drops
+    # the highest fixed channel.
     if len(fixed_conv2d_outputs) % 2 > 0:
-        fixed_dw_outputs.popitem()
+        fixed_conv2d_outputs.popitem()
 
     if not fixed_conv2d_outputs:
         return None
@@ -321,9 +389,9 @@ def _densify_conv_pool_dense_pattern(attrs, inputs):
     unneeded_channels = tuple(fixed_conv2d_outputs.keys())
     new_top_conv2d = _excise_conv2d_channels(unneeded_channels, top_conv2d.args[0], top_requantize)
     new_avg_pool = _excise_avg_pool_channels(unneeded_channels, new_top_conv2d, first_reshape)
-    new_conv, extra_bias = _fold_into_dense_bias(fixed_conv2d_outputs, inputs[0], new_avg_pool)
+    new_conv, extra_bias = _fold_into_dense_bias(fixed_conv2d_outputs, dense, new_avg_pool)
 
-    new_bias = inputs[1].data.numpy() + extra_bias
+    new_bias = _constant_numpy(inputs[1]) + extra_bias
     new_op = relay.nn.bias_add(new_conv, relay.Constant(nd.array(new_bias)), **attrs)
     return new_op
 
@@ -336,7 +404,7 @@ def legalize_bias_add(attrs, inputs, _tinfos):
     should we enable them for all platforms, not just arm_cpu?
     """
 
-    if prev_ops_match(
+    ops = prev_ops_collect(
         inputs[0],
         (
             "qnn.conv2d",
@@ -347,19 +415,18 @@ def legalize_bias_add(attrs, inputs, _tinfos):
             "nn.bias_add",
             "qnn.conv2d",
         ),
-    ):
-        current_conv = inputs[0]
-        depthwise_conv2d = current_conv.args[0].args[0].args[0]
-        top_conv2d = depthwise_conv2d.args[0].args[0].args[0]
+    )
+    if ops:
+        current_conv, _, _, depthwise_conv2d, _, _, top_conv2d = ops
         if (
             not any(get_const_tuple(current_conv.attrs.padding))
             and current_conv.attrs.groups == 1
             and depthwise_conv2d.attrs.groups > 1
             and top_conv2d.attrs.groups == 1
         ):
-            return _densify_conv_depthwise_conv_pattern(attrs, inputs)
+            return _densify_conv_depthwise_conv_pattern(attrs, inputs, ops)
 
-    if prev_ops_match(
+    ops = prev_ops_collect(
         inputs[0],
         (
             "qnn.dense",
@@ -372,11 +439,10 @@ def legalize_bias_add(attrs, inputs, _tinfos):
             "nn.bias_add",
             "qnn.conv2d",
         ),
-    ):
-        avg_pool = inputs[0].args[0].args[0].args[0].args[0]
-        top_requantize = avg_pool.args[0].args[0]
-        top_conv2d = top_requantize.args[0].args[0]
+    )
+    if ops:
+        top_conv2d = ops[-1]
         if top_conv2d.attrs.groups == 1:
-            return _densify_conv_pool_dense_pattern(attrs, inputs)
+            return _densify_conv_pool_dense_pattern(attrs, inputs, ops)
 
     return None
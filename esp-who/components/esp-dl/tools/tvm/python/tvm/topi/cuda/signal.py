@@ -27,6 +27,19 @@ def _get_max_threads(batch_row):
     return tir.min(batch_row, max_threads)
 
 
+def _get_tile_size(n_fft):
+    max_threads = int(tvm.target.Target.current(allow_none=False).max_num_threads)
+    if isinstance(n_fft, (int, tir.IntImm)):
+        return min(int(n_fft), max_threads)
+    return max_threads
+
+
+def _cast(dtype, value):
+    if value.dtype == dtype:
+        return value
+    return tir.Cast(dtype, value)
+
+
 def stft(
     data,
     n_fft,
@@ -36,6 +49,7 @@ def stft(
     normalized,
     onesided,
     output_shape,
+    compute_dtype=None,
 ):
     """
     The STFT computes the Fourier transform of short overlapping windows of the input.
@@ -56,6 +70,10 @@ def stft(
         Whether to return the normalized STFT results
     onesided : bool
         Whether to return onesided result or fill with conjugate symmetry
+    compute_dtype : Optional[str]
+        The dtype the window, the input samples and the twiddle factors are stored and multiplied
+        in, e.g. "float16" or "bfloat16". The sums are still accumulated in the input dtype.
+        Defaults to the input dtype.
     Returns
     -------
     output : relay.Expr
@@ -85,41 +103,101 @@ def stft(
         data = ib.buffer_ptr(data_ptr)
         window = ib.buffer_ptr(window_ptr)
         output = ib.buffer_ptr(output_ptr)
-        max_threads = _get_max_threads(output_ptr.shape[0] * output_ptr.shape[1])
-        output_size = output_ptr.shape[0] * output_ptr.shape[1] * output_ptr.shape[2]
+        n_freq = output_ptr.shape[1]
+        twiddle_re = ib.allocate(
+            compute_dtype, (n_freq, win_length), name="twiddle_re", scope="global"
+        )
+        twiddle_im = ib.allocate(
+            compute_dtype, (n_freq, win_length), name="twiddle_im", scope="global"
+        )
+
+        # Prologue: the twiddle factors only depend on (row, wlen), so compute them once
+        # instead of once per (batch, col) in the inner loop of the main kernel.
+        max_threads = _get_max_threads(win_length)
         with ib.new_scope():
             nthread_tx = max_threads
-            nthread_bx = ceil_div(output_size, max_threads)
+            nthread_bx = ceil_div(win_length, max_threads)
             tx = te.thread_axis("threadIdx.x")
             bx = te.thread_axis("blockIdx.x")
+            by = te.thread_axis("blockIdx.y")
             ib.scope_attr(tx, "thread_extent", nthread_tx)
             ib.scope_attr(bx, "thread_extent", nthread_bx)
-            tid = bx * max_threads + tx
+            ib.scope_attr(by, "thread_extent", n_freq)
+            row = by
+            wlen = bx * max_threads + tx
+
+            with ib.if_scope(wlen < win_length):
+                angle = 2 * pi * row * wlen / win_length
+                twiddle_re[row, wlen] = tir.Cast(compute_dtype, tir.cos(angle))
+                twiddle_im[row, wlen] = tir.Cast(compute_dtype, tir.sin(angle))
 
-            with ib.if_scope(tid < output_size):
-                matrix_size = output_ptr.shape[1] * output_ptr.shape[2]
-                batch = tir.floordiv(tid, matrix_size)
-                row = tir.floordiv(tir.indexmod(tid, matrix_size), output_ptr.shape[2])
-                col = tir.indexmod(tir.indexmod(tid, matrix_size), output_ptr.shape[2])
-                output[batch, row, col, 0] = tir.Cast(data_ptr.dtype, 0)
-                output[batch, row, col, 1] = tir.Cast(data_ptr.dtype, 0)
-                with ib.for_range(0, win_length) as wlen:
-                    output[batch, row, col, 0] += (
-                        window[wlen]
-                        * data[batch, col * hop_length + wlen]
-                        * tir.cos(2 * pi * row * wlen / win_length)
+        # Main kernel: one block per frame, with batch and col fused on blockIdx.x since
+        # blockIdx.y is capped at 65535. The windowed frame is staged in shared memory once, then
+        # each warp computes frequency rows, its lanes splitting the window and combining their
+        # partial sums with warp shuffles.
+        target = tvm.target.Target.current(allow_none=False)
+        warp_size = int(target.thread_warp_size)
+        rows_per_block = int(target.max_num_threads) // warp_size
+        if isinstance(n_freq, (int, tir.IntImm)):
+            rows_per_block = min(rows_per_block, int(n_freq))
+        block_size = rows_per_block * warp_size
+        with ib.new_scope():
+            tx = te.thread_axis("threadIdx.x")
+            ty = te.thread_axis("threadIdx.y")
+            bx = te.thread_axis("blockIdx.x")
+            n_col = output_ptr.shape[2]
+            ib.scope_attr(tx, "thread_extent", warp_size)
+            ib.scope_attr(ty, "thread_extent", rows_per_block)
+            ib.scope_attr(bx, "thread_extent", output_ptr.shape[0] * n_col)
+            batch = tir.indexdiv(bx, n_col)
+            col = tir.indexmod(bx, n_col)
+
+            frame = ib.allocate(compute_dtype, (win_length,), name="frame", scope="shared")
+            with ib.for_range(0, ceil_div(win_length, block_size), name="i") as i:
+                wlen = i * block_size + ty * warp_size + tx
+                with ib.if_scope(wlen < win_length):
+                    frame[wlen] = _cast(compute_dtype, window[wlen]) * _cast(
+                        compute_dtype, data[batch, col * hop_length + wlen]
                     )
-                    output[batch, row, col, 1] -= (
-                        window[wlen]
-                        * data[batch, col * hop_length + wlen]
-                        * tir.sin(2 * pi * row * wlen / win_length)
+            ib.emit(tir.Call(None, "tir.tvm_storage_sync", tvm.runtime.convert(["shared"])))
+
+            acc_re = ib.allocate(data_ptr.dtype, (1,), name="acc_re", scope="local")
+            acc_im = ib.allocate(data_ptr.dtype, (1,), name="acc_im", scope="local")
+            with ib.for_range(0, ceil_div(n_freq, rows_per_block), name="r") as r:
+                row = r * rows_per_block + ty
+                acc_re[0] = tir.Cast(data_ptr.dtype, 0)
+                acc_im[0] = tir.Cast(data_ptr.dtype, 0)
+                with ib.if_scope(row < n_freq):
+                    with ib.for_range(0, ceil_div(win_length, warp_size), name="j") as j:
+                        wlen = j * warp_size + tx
+                        with ib.if_scope(wlen < win_length):
+                            sample = _cast(data_ptr.dtype, frame[wlen])
+                            acc_re[0] += sample * _cast(data_ptr.dtype, twiddle_re[row, wlen])
+                            acc_im[0] -= sample * _cast(data_ptr.dtype, twiddle_im[row, wlen])
+
+                # Every lane of the warp reaches the shuffles, whatever its row and window bounds.
+                mask = tir.op.tvm_warp_activemask()
+                offset = warp_size // 2
+                while offset > 0:
+                    acc_re[0] += tir.op.tvm_warp_shuffle_down(
+                        mask, acc_re[0], offset, warp_size, warp_size
                     )
-                with ib.if_scope(normalized):
-                    output[batch, row, col, 0] /= tir.sqrt(tir.const(n_fft, "float32"))
-                    output[batch, row, col, 1] /= tir.sqrt(tir.const(n_fft, "float32"))
+                    acc_im[0] += tir.op.tvm_warp_shuffle_down(
+                        mask, acc_im[0], offset, warp_size, warp_size
+                    )
+                    offset //= 2
+
+                with ib.if_scope(tir.all(tx == 0, row < n_freq)):
+                    with ib.if_scope(normalized):
+                        acc_re[0] /= tir.sqrt(tir.const(n_fft, "float32"))
+                        acc_im[0] /= tir.sqrt(tir.const(n_fft, "float32"))
+                    output[batch, row, col, 0] = acc_re[0]
+                    output[batch, row, col, 1] = acc_im[0]
 
         return ib.get()
 
+    if compute_dtype is None:
+        compute_dtype = data.dtype
     output_buf = tir.decl_buffer(output_shape, data.dtype, "output_buf")
 
     return te.extern(
@@ -139,6 +217,7 @@ def dft(
     re_data: te.Tensor,
     im_data: te.Tensor,
     inverse: tir.IntImm,
+    compute_dtype=None,
 ):
     """
     Computes the discrete Fourier transform of input (calculation along the last axis).
@@ -156,6 +235,11 @@ def dft(
     inverse : bool
         Whether to perform the inverse discrete fourier transform.
 
+    compute_dtype : Optional[str]
+        The dtype the input samples and the twiddle factors are stored and multiplied in, e.g.
+        "float16" or "bfloat16". The sums are still accumulated in the output dtype. Defaults to
+        the input dtype.
+
     Returns
     -------
     re_output : relay.Expr
@@ -185,40 +269,85 @@ def dft(
         sign = -1 if inverse else 1
         factor = 1.0 / n_fft if inverse else 1.0
 
-        max_threads = _get_max_threads(base_range)
+        dtype = re_output_ptr.dtype
+        twiddle_re = ib.allocate(compute_dtype, (n_fft,), name="twiddle_re", scope="global")
+        twiddle_im = ib.allocate(compute_dtype, (n_fft,), name="twiddle_im", scope="global")
+
+        # Prologue: exp(-2*pi*i*n*k/n_fft) only depends on n*k modulo n_fft, so a single
+        # period of n_fft twiddle factors serves every (n, k) pair. The inverse transform's
+        # sign and 1/n_fft scaling are folded into the table, so the main loop is plain FMAs.
+        max_threads = _get_max_threads(n_fft)
         with ib.new_scope():
             nthread_tx = max_threads
-            nthread_bx = ceil_div(base_range, max_threads)
+            nthread_bx = ceil_div(n_fft, max_threads)
             tx = te.thread_axis("threadIdx.x")
             bx = te.thread_axis("blockIdx.x")
             ib.scope_attr(tx, "thread_extent", nthread_tx)
             ib.scope_attr(bx, "thread_extent", nthread_bx)
 
             tid = bx * max_threads + tx
-            with ib.if_scope(tid < base_range):
-                base_idx = tid * n_fft
-                with ib.for_range(0, n_fft) as n:
-                    n_idx = base_idx + n
-                    re_output_ptr[n_idx] = tir.Cast(re_output_ptr.dtype, 0)
-                    im_output_ptr[n_idx] = tir.Cast(im_output_ptr.dtype, 0)
-                    _w = sign * -2 * pi * n / n_fft
-                    with ib.for_range(0, n_fft) as k:
-                        k_idx = base_idx + k
-                        w = _w * k
-                        cos_w = tir.Cast(re_output_ptr.dtype, tir.cos(w))
-                        sin_w = tir.Cast(re_output_ptr.dtype, tir.sin(w))
-                        re_output_ptr[n_idx] += (
-                            re_data_ptr[k_idx] * cos_w - im_data_ptr[k_idx] * sin_w
-                        )
-                        im_output_ptr[n_idx] += (
-                            re_data_ptr[k_idx] * sin_w + im_data_ptr[k_idx] * cos_w
-                        )
-
-                    re_output_ptr[n_idx] *= tir.Cast(re_output_ptr.dtype, factor)
-                    im_output_ptr[n_idx] *= tir.Cast(im_output_ptr.dtype, factor)
+            with ib.if_scope(tid < n_fft):
+                w = -2 * pi * tid / n_fft
+                twiddle_re[tid] = tir.Cast(compute_dtype, factor * tir.cos(w))
+                twiddle_im[tid] = tir.Cast(compute_dtype, sign * factor * tir.sin(w))
+
+        # Each block computes a tile of output frequencies of one signal and walks the input
+        # in tiles staged through shared memory, so every sample is read from global memory
+        # once per block instead of once per output frequency.
+        tile_size = _get_tile_size(n_fft)
+        num_tiles = ceil_div(n_fft, tile_size)
+        with ib.new_scope():
+            tx = te.thread_axis("threadIdx.x")
+            bx = te.thread_axis("blockIdx.x")
+            by = te.thread_axis("blockIdx.y")
+            ib.scope_attr(tx, "thread_extent", tile_size)
+            ib.scope_attr(bx, "thread_extent", base_range)
+            ib.scope_attr(by, "thread_extent", num_tiles)
+
+            re_tile = ib.allocate(compute_dtype, (tile_size,), name="re_tile", scope="shared")
+            im_tile = ib.allocate(compute_dtype, (tile_size,), name="im_tile", scope="shared")
+            acc_re = ib.allocate(dtype, (1,), name="acc_re", scope="local")
+            acc_im = ib.allocate(dtype, (1,), name="acc_im", scope="local")
+            w_idx = ib.allocate("int32", (1,), name="w_idx", scope="local")
+            acc_re[0] = tir.Cast(dtype, 0)
+            acc_im[0] = tir.Cast(dtype, 0)
+
+            base_idx = bx * n_fft
+            n = by * tile_size + tx
+            # The twiddle index n * k mod n_fft advances by n per k, so it is stepped with a
+            # conditional subtract in int32 instead of a multiply and modulo per (n, k). Threads
+            # past the end have n >= n_fft, hence the step is reduced modulo n_fft first.
+            n_fft_i32 = _cast("int32", n_fft)
+            step = _cast("int32", tir.indexmod(n, n_fft))
+            with ib.for_range(0, num_tiles, name="k_tile") as k_tile:
+                k_start = k_tile * tile_size
+                # n * k_start overflows int32 once n_fft exceeds ~46341, so seed it in int64
+                w_idx[0] = _cast("int32", tir.indexmod(_cast("int64", n) * k_start, n_fft))
+                with ib.if_scope(k_start + tx < n_fft):
+                    re_tile[tx] = _cast(compute_dtype, re_data_ptr[base_idx + k_start + tx])
+                    im_tile[tx] = _cast(compute_dtype, im_data_ptr[base_idx + k_start + tx])
+                ib.emit(tir.Call(None, "tir.tvm_storage_sync", tvm.runtime.convert(["shared"])))
+
+                with ib.for_range(0, tir.min(tile_size, n_fft - k_start), name="k") as k:
+                    cos_w = _cast(dtype, twiddle_re[w_idx[0]])
+                    sin_w = _cast(dtype, twiddle_im[w_idx[0]])
+                    re_k = _cast(dtype, re_tile[k])
+                    im_k = _cast(dtype, im_tile[k])
+                    acc_re[0] += re_k * cos_w - im_k * sin_w
+                    acc_im[0] += re_k * sin_w + im_k * cos_w
+                    w_idx[0] += step
+                    with ib.if_scope(w_idx[0] >= n_fft_i32):
+                        w_idx[0] -= n_fft_i32
+                ib.emit(tir.Call(None, "tir.tvm_storage_sync", tvm.runtime.convert(["shared"])))
+
+            with ib.if_scope(n < n_fft):
+                re_output_ptr[base_idx + n] = acc_re[0]
+                im_output_ptr[base_idx + n] = acc_im[0]
 
         return ib.get()
 
+    if compute_dtype is None:
+        compute_dtype = re_data.dtype
     output_shape = [re_data.shape] * 2
 
     return te.extern(
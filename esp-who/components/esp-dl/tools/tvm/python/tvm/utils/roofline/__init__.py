@@ -163,13 +163,21 @@ def roofline_from_existing(
                 flops, peak_flops, flops_name = registry.estimate_peak_flops(
                     prim, features, target, dev, remote
                 )
-                loaded_bytes, peak_bandwidth, bandwidth_name = registry.estimate_peak_bandwidth(
-                    prim, features, target, dev, remote
-                )
+                (
+                    loaded_bytes,
+                    peak_bandwidth,
+                    bandwidth_name,
+                    *memory_level,
+                ) = registry.estimate_peak_bandwidth(prim, features, target, dev, remote)
             new_configuration[f"Estimated Peak FLOP/s ({flops_name})"] = profiling.Ratio(peak_flops)
             new_configuration[
                 f"Estimated Peak Bandwidth ({bandwidth_name}, byte/second)"
             ] = profiling.Ratio(peak_bandwidth)
+            # Estimators that tell the cache levels apart also report the level `prim` runs
+            # from and its roof, which `prim` is then measured against
+            level_name = None
+            if memory_level:
+                level_name, peak_bandwidth = memory_level[0]
             ridge_point = peak_flops / peak_bandwidth
 
             runtime = call["Duration (us)"].microseconds * 1e-6
@@ -180,6 +188,8 @@ def roofline_from_existing(
             call["Arithmetic Intensity"] = profiling.Ratio(arith_inten)
             call["FLOP/s"] = profiling.Ratio(flops / runtime)
             call["Bandwidth"] = profiling.Ratio(loaded_bytes / runtime)
+            if level_name is not None:
+                call["Memory Level"] = level_name
             compute_bound = arith_inten > ridge_point
             call["Bound"] = "compute" if compute_bound else "memory"
             per_mem_bound = (loaded_bytes / runtime) / peak_bandwidth * 100
@@ -224,6 +234,9 @@ def roofline_analysis(
       - Arithmetic Intensity: ratio of FLOPs per byte of data.
       - FLOP/s: floating point operations per second.
       - Bandwidth: Number of bytes loaded per second.
+      - Memory Level: level of the memory hierarchy the operator's data fits
+        in, whose bandwidth is used for the bound. Only reported on targets
+        that measure the cache levels separately.
 
     Parameters
     ----------
@@ -344,7 +344,8 @@ def estimate_peak_bandwidth_global_mem(
     a = nd.empty((blocks, size, 4, warp_size), dtype="float32", device=dev)
     b = nd.empty((blocks, 4, warp_size), dtype="float32", device=dev)
     times = f.time_evaluator(f.entry_name, dev, repeat=10, number=1)(a, b)
-    return a.numpy().size * 4 / times.min  # 4 bytes per float32
+    # Computed from the shape, `a.numpy()` would copy the whole buffer back to the host
+    return blocks * size * 4 * warp_size * 4 / times.min  # 4 bytes per float32
 
 
 @registry.estimate_peak_bandwidth.register("cuda")
@@ -64,6 +64,10 @@ def estimate_peak_bandwidth(
         Peak memory bandwidth in bytes/seconds.
     name : str
         Name of the memory being used.
+    memory_level : Tuple[str, float], optional
+        Estimators that measure the cache levels separately may return a
+        fourth value: the name of the level `func` is expected to run from and
+        its peak bandwidth in bytes/second.
     """
     raise NotImplementedError()
 
@@ -14,14 +14,21 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
-"""Estimate peak flops and bandwidth for x86 devices"""
+"""Estimate peak flops and bandwidth for x86 and Arm CPUs"""
 import functools
+import inspect
+import json
+import os
+import platform
 import re
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
 from typing import Dict, Optional, Tuple
 
 import numpy as np
 
-from ... import build, get_global_func, nd, transform
+from ... import IRModule, build, get_global_func, nd, transform
 from ...contrib import utils
 from ...rpc.base import RPC_SESS_MASK
 from ...rpc.client import RPCSession
@@ -31,6 +38,128 @@ from ...target import Target, x86
 from ...tir import PrimFunc
 from . import registry
 
+# Environment variable that enables the on-disk cache of measured peaks when set to 1
+ROOFLINE_CACHE_VAR = "TVM_ROOFLINE_CACHE"
+
+# Location of the on-disk cache of measured peaks
+ROOFLINE_CACHE_PATH = Path(Path("~").expanduser(), ".tvm", "roofline_cache.json")
+
+
+def _load_roofline_cache() -> Dict[str, float]:
+    """Read the on-disk cache of measured peaks, empty if it is missing or unreadable."""
+    try:
+        with open(ROOFLINE_CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _memoize_peak(func):
+    """Memoize a peak measurement `func(target, dev, remote, ...)`.
+
+    The measurements take seconds, so they are cached in memory keyed on the
+    string form of the target, the device type and id, and the remaining
+    arguments, which does not rely on `Target` or `Device` being hashable.
+    When ROOFLINE_CACHE_VAR is set to 1 local measurements are also persisted
+    in ROOFLINE_CACHE_PATH, additionally keyed on the host name and thread
+    count since the file may be shared between machines and runs. Remote
+    measurements are never persisted, as the machine behind an RPC session is
+    not part of the key.
+    """
+    signature = inspect.signature(func)
+    cache = {}
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        target, dev, remote, *rest = bound.arguments.values()
+        key = json.dumps(
+            [func.__name__, str(target), dev.device_type, dev.device_id] + [str(x) for x in rest]
+        )
+        if (key, remote) in cache:
+            return cache[(key, remote)]
+        on_disk = remote is None and os.environ.get(ROOFLINE_CACHE_VAR, "0") == "1"
+        disk_key = json.dumps([platform.node(), num_threads(), key])
+        value = _load_roofline_cache().get(disk_key) if on_disk else None
+        if value is None:
+            value = func(*bound.args, **bound.kwargs)
+            if on_disk:
+                disk_cache = _load_roofline_cache()
+                disk_cache[disk_key] = value
+                ROOFLINE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+                # Write a uniquely named sibling and rename it into place, so concurrent
+                # processes never leave a truncated cache behind
+                with tempfile.NamedTemporaryFile(
+                    "w",
+                    encoding="utf-8",
+                    dir=ROOFLINE_CACHE_PATH.parent,
+                    suffix=".tmp",
+                    delete=False,
+                ) as f:
+                    json.dump(disk_cache, f, indent=2)
+                os.replace(f.name, ROOFLINE_CACHE_PATH)
+        cache[(key, remote)] = value
+        return value
+
+    return wrapper
+
+
+# Vector register width in bytes and number of architectural vector registers per x86 vector ISA.
+_X86_VECTOR_UNITS = {
+    "avx512": (64, 32),
+    "avx2": (32, 16),
+    "sse": (16, 16),
+}
+
+
+def _x86_vector_isa(target: Target) -> str:
+    """Widest vector ISA supported by an x86 target, from its -mcpu and -mattr."""
+    mattr = target.mattr
+    if x86.target_has_avx512(target.mcpu) or "+avx512f" in mattr:
+        return "avx512"
+    if x86.target_has_avx2(target.mcpu) or "+avx2" in mattr or "+fma" in mattr:
+        return "avx2"
+    return "sse"
+
+
+# Number of architectural SIMD registers per Arm architecture: AArch64 has 32 V registers, Armv7
+# NEON has 16 Q registers.
+_ARM_VECTOR_REGISTERS = {
+    "aarch64": 32,
+    "arm": 16,
+}
+
+
+def _arm_arch(target: Target) -> Optional[str]:
+    """Arm architecture of a target as a key of _ARM_VECTOR_REGISTERS, or None if it is not Arm."""
+    mtriple = str(target.attrs.get("mtriple", ""))
+    if mtriple.startswith(("aarch64", "arm64")):
+        return "aarch64"
+    if mtriple.startswith(("arm", "thumb")):
+        return "arm"
+    return None
+
+
+# Dot-product instructions that accumulate several narrow products into each 32-bit lane, keyed
+# by input dtype: (name of the instruction set, LLVM intrinsic formatted with the vector width in
+# bits, accumulator dtype).
+_X86_DOT_PRODUCTS = {
+    "int8": ("VNNI", "llvm.x86.avx512.vpdpbusd.{}", "int32"),
+    "uint8": ("VNNI", "llvm.x86.avx512.vpdpbusd.{}", "int32"),
+    "bfloat16": ("AVX512-BF16", "llvm.x86.avx512bf16.dpbf16ps.{}", "float32"),
+}
+
+
+def _x86_has_dot_product(target: Target, dtype: str) -> bool:
+    """Whether an x86 target has the dot-product instruction for `dtype` in _X86_DOT_PRODUCTS."""
+    mattr = target.mattr
+    if dtype in ("int8", "uint8"):
+        return x86.target_has_vnni(target.mcpu) or "+avx512vnni" in mattr or "+avxvnni" in mattr
+    if dtype == "bfloat16":
+        return target.mcpu in ("cooperlake", "sapphirerapids") or "+avx512bf16" in mattr
+    return False
+
 
 def _detect_vec_width_registers(
     target: Target, vec_width: Optional[int], num_vector_registers: Optional[int]
@@ -54,26 +183,134 @@ def _detect_vec_width_registers(
         Number of vector registers on `target`.
     """
     if vec_width is None:
-        # Only implemented for x86 so far...
-        if (
+        if _arm_arch(target) is not None:
+            # NEON registers are 128 bits wide. This also holds for SVE targets: the probes use
+            # fixed length vectors, which LLVM lowers to NEON whatever the SVE vector length is.
+            vec_width = 16
+        elif (
             str(target.kind) == "llvm"
             and target.device_name == ""
             and len(target.keys) == 1
             and target.keys[0] == "cpu"
         ):
-            with target:
-                vec_width = x86.get_simd_32bit_lanes() * 4  # in number of bytes
+            vec_width = _X86_VECTOR_UNITS[_x86_vector_isa(target)][0]
         else:
             raise RuntimeError(f"Cannot determine vector width for target {target}")
     if num_vector_registers is None:
-        if target.device_name == "":  # indicates x86
-            num_vector_registers = 16  # Assuming for all platforms, probably wrong on older ones
+        arm_arch = _arm_arch(target)
+        if arm_arch is not None:
+            num_vector_registers = _ARM_VECTOR_REGISTERS[arm_arch]
+        elif target.device_name == "":  # indicates x86
+            # AVX-512 doubles the register file to 32 ZMM registers, older ISAs have 16
+            num_vector_registers = _X86_VECTOR_UNITS[_x86_vector_isa(target)][1]
         else:
             raise RuntimeError(f"Cannot determine number of vector registers for target {target}")
     return vec_width, num_vector_registers
 
 
-@functools.lru_cache(maxsize=None)
+# Number of iterations of the FLOP/s probes, and the unroll factor of that loop
+_PROBE_ITERS = 1000000
+_PROBE_UNROLL = 8
+
+
+def _prepare_remote(f, dev: Device, remote: Optional[RPCSession], name: str):
+    """Upload a built probe to the remote if `dev` is an RPC device.
+
+    Everything goes over the single connection of `remote`, which does not
+    support concurrent calls, so the steps are issued back to back.
+
+    Parameters
+    ----------
+    f : Module
+        Module built for the probe.
+    dev : Device
+        Device the probe will run on.
+    remote : Optional[RPCSession]
+        Remote session used to upload `f`. Must be the same session used to create `dev`.
+    name : str
+        Base name of the uploaded library.
+
+    Returns
+    -------
+    f : Module
+        `f`, or its remote counterpart when running over RPC.
+    random_fill : PackedFunc
+        `tvm.contrib.random.random_fill` on the same side as `f`.
+    """
+    if dev.device_type >= RPC_SESS_MASK:
+        if remote is None:
+            raise RuntimeError("A RPCSession must be provided when using a remote device.")
+        temp = utils.tempdir()
+        path = temp.relpath(f"{name}.tar")
+        f.export_library(path)
+        remote.upload(path)
+        f = remote.load_module(f"{name}.tar")
+        random_fill = remote.get_function("tvm.contrib.random.random_fill")
+    else:
+        random_fill = get_global_func("tvm.contrib.random.random_fill")
+    assert random_fill, "Please make sure USE_RANDOM is ON in config.cmake"
+    return f, random_fill
+
+
+def _num_accumulators(num_vector_registers: int) -> int:
+    """Number of accumulators the flops probes keep live: every vector
+    register except the two holding the multiplicands, and at least one.
+    """
+    return max(num_vector_registers - 2, 1)
+
+
+def _fma_probe(dtype: str, vec_width: int, num_accumulators: int, nthreads: int) -> PrimFunc:
+    """Build the FMA throughput probe, exported as `peakflops_tir`. Each of
+    `nthreads` threads runs `_PROBE_ITERS` FMAs of `vec_width` lanes of
+    `dtype` into each of `num_accumulators` accumulators.
+    """
+
+    # The probe sizes are closed over rather than specialized, so they are
+    # constants from the start and the iteration loop can be unrolled by
+    # _PROBE_UNROLL without a remainder.
+    @T.prim_func
+    def peakflops_mad_tir(a: T.handle, b: T.handle, c: T.handle) -> None:
+        # pylint: disable=invalid-name, missing-function-docstring
+        A = T.match_buffer(a, [nthreads, vec_width], dtype)
+        B = T.match_buffer(b, [nthreads, vec_width], dtype)
+        C = T.match_buffer(c, [nthreads, num_accumulators, vec_width], dtype)
+        for t in T.parallel(nthreads):
+            for _j in range(_PROBE_ITERS // _PROBE_UNROLL):
+                for _u in T.unroll(_PROBE_UNROLL):
+                    for l in T.unroll(num_accumulators):
+                        # `A` and `B` are loop invariant and stay in two registers, every
+                        # other register holds one accumulator of `C`. Each unrolled `l` is
+                        # its own dependency chain and only ever waits on the previous FMA
+                        # into the same accumulator, so this measures FMA throughput rather
+                        # than latency.
+                        for k in T.vectorized(vec_width):
+                            C[t, l, k] = A[t, k] * B[t, k] + C[t, l, k]
+
+    @T.prim_func
+    def peakflops_fma_tir(a: T.handle, b: T.handle, c: T.handle) -> None:
+        # pylint: disable=invalid-name, missing-function-docstring
+        A = T.match_buffer(a, [nthreads, vec_width], dtype)
+        B = T.match_buffer(b, [nthreads, vec_width], dtype)
+        C = T.match_buffer(c, [nthreads, num_accumulators, vec_width], dtype)
+        for t in T.parallel(nthreads):
+            for _j in range(_PROBE_ITERS // _PROBE_UNROLL):
+                for _u in T.unroll(_PROBE_UNROLL):
+                    for l in T.unroll(num_accumulators):
+                        # Same as peakflops_mad_tir, but calls llvm.fma directly so the
+                        # multiply and add are fused even when LLVM is not allowed to
+                        # contract a separate mul + add.
+                        for k in T.vectorized(vec_width):
+                            C[t, l, k] = T.call_llvm_pure_intrin(
+                                dtype, "llvm.fma", T.uint32(3), A[t, k], B[t, k], C[t, l, k]
+                            )
+
+    # llvm.fma is only used for the IEEE types with native x86 FMA instructions, everything else
+    # (e.g. integers) keeps the plain multiply-add
+    probe = peakflops_fma_tir if str(dtype) in ("float32", "float64") else peakflops_mad_tir
+    return probe.with_attr("global_symbol", "peakflops_tir")
+
+
+@_memoize_peak
 def estimate_peak_fma_vector_flops(
     target: Target,
     dev: Device,
@@ -85,60 +322,89 @@ def estimate_peak_fma_vector_flops(
     """Estimate peak flops assuming vector fma instructions and no explicit
     intrinsics. See estimate_peak_fma_flops.
     """
-
-    @T.prim_func
-    def peakflops_fma_tir(
-        a: T.handle,
-        vec_width: T.int32,
-        iters: T.int32,
-        num_vector_registers: T.int32,
-        threads: T.int32,
-    ) -> None:
-        # pylint: disable=invalid-name, missing-function-docstring
-        A = T.match_buffer(a, [threads, num_vector_registers, vec_width], dtype)
-        for t in T.parallel(threads):
-            for _j in range(iters):
-                for l in T.unroll(num_vector_registers):
-                    # We want to use as few registers as possible, so we perform
-                    # all operations on the same element
-                    for k in T.vectorized(vec_width):
-                        A[t, l, k] = A[t, l, k] * A[t, l, k] + A[t, l, k]
-
     vec_width, num_vector_registers = _detect_vec_width_registers(
         target, vec_width, num_vector_registers
     )
+    f, random_fill = _build_roofline_probes(
+        target, dev, remote, vec_width, (str(dtype), num_vector_registers)
+    )
     vec_width //= DataType(dtype).bits // 8
-    iters = 1000000
+    num_accumulators = _num_accumulators(num_vector_registers)
     nthreads = num_threads()
-    specialized = peakflops_fma_tir.specialize(
-        {
-            peakflops_fma_tir.params[1]: vec_width,
-            peakflops_fma_tir.params[2]: iters,
-            peakflops_fma_tir.params[3]: num_vector_registers,
-            peakflops_fma_tir.params[4]: nthreads,
-        }
+
+    a = nd.empty((nthreads, vec_width), dtype=dtype, device=dev)
+    random_fill(a)
+    b = nd.empty((nthreads, vec_width), dtype=dtype, device=dev)
+    random_fill(b)
+    c = nd.empty((nthreads, num_accumulators, vec_width), dtype=dtype, device=dev)
+    random_fill(c)
+    # Averaging several back-to-back calls per repeat and taking the fastest
+    # repeat filters out scheduling noise. time_evaluator already makes one
+    # untimed warm-up call, so cold caches and iTLB are not measured.
+    times = f.time_evaluator("peakflops_tir", dev, repeat=20, number=5, min_repeat_ms=100)(a, b, c)
+    flops = 2 * vec_width * num_accumulators * nthreads * _PROBE_ITERS  # fma is two flops
+    return flops / times.min
+
+
+@_memoize_peak
+def estimate_peak_dot_product_flops(
+    target: Target,
+    dev: Device,
+    remote: Optional[RPCSession],
+    dtype: DataType,
+    vec_width: Optional[int] = None,
+    num_vector_registers: Optional[int] = None,
+):
+    """Estimate peak ops using the x86 dot-product instruction for `dtype`
+    (VNNI for int8, AVX512-BF16 for bfloat16). See estimate_peak_fma_flops.
+    """
+    _, intrin, acc_dtype = _X86_DOT_PRODUCTS[str(dtype)]
+    vec_width, num_vector_registers = _detect_vec_width_registers(
+        target, vec_width, num_vector_registers
     )
+    intrin = intrin.format(vec_width * 8)
+    lanes = vec_width // 4
+    vec_dtype = f"{acc_dtype}x{lanes}"
+    # number of `dtype` products summed into each 32-bit lane by one instruction
+    products_per_lane = 32 // DataType(dtype).bits
+    num_accumulators = _num_accumulators(num_vector_registers)
+    nthreads = num_threads()
+
+    @T.prim_func
+    def peakflops_dot_tir(a: T.handle, b: T.handle, c: T.handle) -> None:
+        # pylint: disable=invalid-name, missing-function-docstring
+        # The narrow inputs are packed into 32-bit lanes, like the instructions expect them.
+        A = T.match_buffer(a, [nthreads, lanes], "int32")
+        B = T.match_buffer(b, [nthreads, lanes], "int32")
+        C = T.match_buffer(c, [nthreads, num_accumulators, lanes], acc_dtype)
+        for t in T.parallel(nthreads):
+            for _j in range(_PROBE_ITERS // _PROBE_UNROLL):
+                for _u in T.unroll(_PROBE_UNROLL):
+                    for l in T.unroll(num_accumulators):
+                        # Independent accumulators, see peakflops_mad_tir
+                        C[t, l, T.ramp(0, 1, lanes)] = T.call_llvm_pure_intrin(
+                            vec_dtype,
+                            intrin,
+                            T.uint32(3),
+                            C[t, l, T.ramp(0, 1, lanes)],
+                            A[t, T.ramp(0, 1, lanes)],
+                            B[t, T.ramp(0, 1, lanes)],
+                        )
+
     with transform.PassContext(opt_level=3):
-        f = build(specialized, target=target)
+        f = build(peakflops_dot_tir, target=target)
 
-    # upload to remote if running over rpc
-    if dev.device_type >= RPC_SESS_MASK:
-        if remote is None:
-            raise RuntimeError("A RPCSession must be provided when using a remote device.")
-        temp = utils.tempdir()
-        path = temp.relpath("peak_fma_flops.tar")
-        f.export_library(path)
-        remote.upload(path)
-        f = remote.load_module("peak_fma_flops.tar")
-        random_fill = remote.get_function("tvm.contrib.random.random_fill")
-    else:
-        random_fill = get_global_func("tvm.contrib.random.random_fill")
-    assert random_fill, "Please make sure USE_RANDOM is ON in config.cmake"
+    f, random_fill = _prepare_remote(f, dev, remote, "peak_dot_product_flops")
 
-    a = nd.empty((nthreads, num_vector_registers, vec_width), dtype=dtype, device=dev)
+    a = nd.empty((nthreads, lanes), dtype="int32", device=dev)
     random_fill(a)
-    times = f.time_evaluator(f.entry_name, dev, repeat=100, number=1)(a)
-    flops = 2 * vec_width * num_vector_registers * nthreads * iters  # fma is two flops
+    b = nd.empty((nthreads, lanes), dtype="int32", device=dev)
+    random_fill(b)
+    c = nd.empty((nthreads, num_accumulators, lanes), dtype=acc_dtype, device=dev)
+    random_fill(c)
+    times = f.time_evaluator(f.entry_name, dev, repeat=20, number=5, min_repeat_ms=100)(a, b, c)
+    # every product is a multiply and an add
+    flops = 2 * products_per_lane * lanes * num_accumulators * nthreads * _PROBE_ITERS
     return flops / times.min
 
 
@@ -155,7 +421,8 @@ def estimate_peak_fma_flops(
     """
     Estimate the maximum number of FLOP/s this target/device combo is capable
     of reaching by running a test program. This assumes vectorized FMA
-    (fused-multiply-add) instructions.
+    (fused-multiply-add) instructions, or the VNNI/AVX512-BF16 dot-product
+    instructions for int8 and bfloat16 when the target supports them.
 
 
     Parameters
@@ -193,86 +460,246 @@ def estimate_peak_fma_flops(
     """
     # assume that the first argument's dtype is the one we want
     dtype = list(func.buffer_map.values())[0].dtype
-    if "int" in dtype:
-        flops = np.sum(
-            features["int_addsub"]
-            + features["int_mul"]
-            + features["int_mad"] * 2
-            + features["int_divmod"]
-        )
-    else:
-        flops = np.sum(
-            features["float_addsub"]
-            + features["float_mul"]
-            + features["float_mad"] * 2
-            + features["float_divmod"]
+    # Summing each feature separately avoids materializing temporary arrays
+    prefix = "int" if "int" in dtype else "float"
+    flops = (
+        features[f"{prefix}_addsub"].sum()
+        + features[f"{prefix}_mul"].sum()
+        + features[f"{prefix}_mad"].sum() * 2
+        + features[f"{prefix}_divmod"].sum()
+    )
+    if dtype in _X86_DOT_PRODUCTS and _x86_has_dot_product(target, dtype):
+        peak_flops = estimate_peak_dot_product_flops(
+            target, dev, remote, dtype, vec_width, num_vector_registers
         )
+        return flops, peak_flops, f"{dtype} {_X86_DOT_PRODUCTS[dtype][0]}"
     peak_flops = estimate_peak_fma_vector_flops(
         target, dev, remote, dtype, vec_width, num_vector_registers
     )
     return flops, peak_flops, f"{dtype} FMA"
 
 
-@T.prim_func
-def peak_bandwidth_tir(a: T.handle, b: T.handle, threads: T.int32, vec_width: T.int32) -> None:
-    # pylint: disable=invalid-name, missing-function-docstring
-    N = T.int32()
-    A = T.match_buffer(a, [threads, N, 4, vec_width], "float32")
-    B = T.match_buffer(b, [threads, 4, vec_width], "float32")
-    # Parallelism is necessary to hit all cores/nodes
-    for i in T.parallel(threads):
-        for k in T.serial(N):
-            for l in T.unroll(4):
-                # vectorized load is necessary to hit peak bandwidth
+def _peak_bandwidth_probes(threads: int, vec_width: int) -> Dict[str, PrimFunc]:
+    """Build the bandwidth probes and their first-touch kernel for `threads`
+    threads sweeping `vec_width` float32 lanes at a time.
+
+    `peak_bandwidth_tir` prefetches with a non-temporal hint for the DRAM
+    sweep, `peak_bandwidth_cached_tir` keeps the data in cache for the cache
+    levels.
+    """
+    # Software prefetch about 8 cache lines, in blocks of 4 vectors, ahead of the sweep
+    prefetch_blocks = max(512 // (16 * vec_width), 1)
+
+    def sweep(locality):
+        """Sweep kernel prefetching with the llvm.prefetch `locality` hint."""
+
+        @T.prim_func
+        def peak_bandwidth_tir(a: T.handle, b: T.handle, blocks: T.int32, reps: T.int32) -> None:
+            # pylint: disable=invalid-name, missing-function-docstring
+            # Each thread owns one row of `A` and sweeps its first `blocks` blocks of 4
+            # vectors. The row stride is padded (see _BANDWIDTH_ROW_PADDING), so `blocks`
+            # is passed in rather than derived from it.
+            stride = T.int32()
+            A = T.match_buffer(a, [threads, stride], "float32")
+            B = T.match_buffer(b, [threads, 4, vec_width], "float32")
+            # Parallelism is necessary to hit all cores/nodes
+            for i in T.parallel(threads):
+                # Sweeping the same slice of `A` `reps` times keeps it resident in
+                # whichever cache level it fits in, so small sizes measure that level.
+                for _r in T.serial(reps):
+                    for k in T.serial(blocks):
+                        # A `locality` of 0 (non-temporal) keeps the DRAM sweep from
+                        # thrashing the caches, 3 keeps cache resident tiers where
+                        # they are. Prefetching past the end of `A` is harmless as
+                        # prefetches never fault.
+                        T.evaluate(
+                            T.call_intrin(
+                                "int32",
+                                "tir.prefetch",
+                                T.address_of(A[i, (k + prefetch_blocks) * 4 * vec_width]),
+                                0,
+                                locality,
+                                1,
+                            )
+                        )
+                        for l in T.unroll(4):
+                            # Vectorized load is necessary to hit peak bandwidth. The loads
+                            # are written as explicit ramps so they always become full width
+                            # vector loads instead of relying on loop vectorization.
+                            # += is necessary to introduce a data dependency for all
+                            # elements of A, preventing the backend from removing the
+                            # `k` loop and setting `k` to the loop extent.
+                            B[i, l, T.ramp(0, 1, vec_width)] = (
+                                B[i, l, T.ramp(0, 1, vec_width)]
+                                + A[i, T.ramp((k * 4 + l) * vec_width, 1, vec_width)]
+                            )
+
+        return peak_bandwidth_tir
+
+    @T.prim_func
+    def first_touch_tir(a: T.handle) -> None:
+        # pylint: disable=invalid-name, missing-function-docstring
+        stride = T.int32()
+        A = T.match_buffer(a, [threads, stride], "float32")
+        # Pages are placed on the NUMA node of the thread that first writes them.
+        # Touching `A` with the same parallel split as `peak_bandwidth_tir` makes
+        # every thread read memory local to its own socket.
+        for i in T.parallel(threads):
+            for k in T.serial(stride // vec_width):
                 for j in T.vectorized(vec_width):
-                    # += is necessary to introduce a data dependency for all
-                    # elements of A, preventing the backend from removing the
-                    # `k` loop and setting `k` to the loop extent.
-                    B[i, l, j] += A[i, k, l, j]
+                    A[i, k * vec_width + j] = T.float32(0)
 
+    return {
+        "peak_bandwidth_tir": sweep(0),
+        "peak_bandwidth_cached_tir": sweep(3).with_attr(
+            "global_symbol", "peak_bandwidth_cached_tir"
+        ),
+        "first_touch_tir": first_touch_tir,
+    }
 
-@functools.lru_cache(maxsize=None)
-def estimate_peak_bandwidth_dram(
+
+# Per-buffer bytes touched, as named by auto_scheduler.feature
+_BUFFER_BYTES_RE = re.compile(r"^B[0-9]+\.bytes$")
+
+
+# Padding in float32 elements added to the per-thread row of the bandwidth
+# buffer. Row sizes are usually a multiple of 4KB, which makes every thread's
+# stream alias in the L1 and DTLB. One extra cache line breaks the pattern.
+_BANDWIDTH_ROW_PADDING = 64 // 4
+
+
+# Working set in bytes used to measure each level of the memory hierarchy,
+# smallest first. We don't have a way of getting cache sizes, so these are
+# conservative guesses that fit comfortably in the respective cache of current
+# x86 cores. L1 and L2 are private, so their sizes are per thread, while L3 is
+# shared by all cores and its size is the total, see _SHARED_BANDWIDTH_TIERS.
+# DRAM uses a total size larger than any last level cache instead.
+_BANDWIDTH_TIERS = (
+    ("L1", 16 * 1024),
+    ("L2", 512 * 1024),
+    ("L3", 2 * 1024 * 1024),
+    ("DRAM", None),
+)
+
+# Levels of _BANDWIDTH_TIERS shared by all threads rather than private per core
+_SHARED_BANDWIDTH_TIERS = ("L3",)
+
+
+# LRU cache of the local probe modules built by _build_roofline_probes, keyed on
+# the target, thread count and vector width and the FMA probe they hold (None if
+# none). Only built modules are kept: uploading them is redone per call, so no
+# RPC session outlives its caller.
+_ROOFLINE_PROBES_CAPACITY = 4
+_ROOFLINE_PROBES = OrderedDict()  # type: ignore
+
+
+def _build_roofline_probes(
     target: Target,
     dev: Device,
     remote: Optional[RPCSession],
+    vec_width: int,
+    fma: Optional[Tuple[str, int]] = None,
+):
+    """Build the bandwidth probes, plus the FMA probe for `fma = (dtype,
+    num_vector_registers)` if given, into one module and load it on `dev`,
+    see _prepare_remote.
+
+    A roofline analysis needs both, so they share a single build: without
+    `fma` any module already built with an FMA probe is reused. The bandwidth
+    probes thus never depend on the register count of `target`.
+    """
+    threads = num_threads()
+    build_key = (str(target), threads, vec_width)
+    key = (build_key, fma)
+    if fma is None:
+        # any module of the same target and width holds the bandwidth probes
+        key = next((k for k in reversed(_ROOFLINE_PROBES) if k[0] == build_key), key)
+    f = _ROOFLINE_PROBES.get(key)
+    if f is None:
+        funcs = _peak_bandwidth_probes(threads, vec_width)
+        if fma is not None:
+            dtype, num_vector_registers = fma
+            funcs["peakflops_tir"] = _fma_probe(
+                dtype,
+                vec_width // (DataType(dtype).bits // 8),
+                _num_accumulators(num_vector_registers),
+                threads,
+            )
+        with transform.PassContext(opt_level=3):
+            f = build(IRModule(funcs), target=target)
+        _ROOFLINE_PROBES[key] = f
+        if len(_ROOFLINE_PROBES) > _ROOFLINE_PROBES_CAPACITY:
+            _ROOFLINE_PROBES.popitem(last=False)
+    else:
+        _ROOFLINE_PROBES.move_to_end(key)
+    return _prepare_remote(f, dev, remote, "roofline_probes")
+    if fma is None and loaded:
+        return next(iter(loaded.values()))
+    threads = num_threads()
+    funcs = _peak_bandwidth_probes(threads, vec_width)
+    if fma is not None:
+        dtype, num_vector_registers = fma
+        funcs["peakflops_tir"] = _fma_probe(
+            dtype,
+            vec_width // (DataType(dtype).bits // 8),
+            _num_accumulators(num_vector_registers),
+            threads,
+        )
+    with transform.PassContext(opt_level=3):
+        f = build(IRModule(funcs), target=target)
+    loaded[fma] = _prepare_remote(f, dev, remote, "roofline_probes")
+    return loaded[fma]
+
+
+@_memoize_peak
+def estimate_peak_bandwidth_level(
+    target: Target,
+    dev: Device,
+    remote: Optional[RPCSession],
+    level: str,
     vec_width: Optional[int] = None,
 ) -> float:
-    """Estimate peak bandwidth for DRAM. See estimate_peak_bandwidth."""
+    """Estimate peak bandwidth of one level of the memory hierarchy. `level`
+    is one of the names in `_BANDWIDTH_TIERS`. See estimate_peak_bandwidth.
+    """
+    tier_bytes = dict(_BANDWIDTH_TIERS)[level]
+    # The register count is irrelevant to the bandwidth probes, so pass one
+    # rather than detecting it
     vec_width, _ = _detect_vec_width_registers(target, vec_width, 1)
-    specialized = peak_bandwidth_tir.specialize(
-        {
-            peak_bandwidth_tir.params[3]: vec_width,
-        }
-    )
-    with transform.PassContext(opt_level=3):
-        f = build(specialized, target=target)
+    f, random_fill = _build_roofline_probes(target, dev, remote, vec_width)
+    threads = num_threads()
+    if level in _SHARED_BANDWIDTH_TIERS:
+        tier_bytes //= threads
 
-    # upload to remote if running over rpc
-    if dev.device_type >= RPC_SESS_MASK:
-        if remote is None:
-            raise RuntimeError("A RPCSession must be provided when using a remote device.")
-        temp = utils.tempdir()
-        path = temp.relpath("peak_bandwidth.tar")
-        f.export_library(path)
-        remote.upload(path)
-        f = remote.load_module("peak_bandwidth.tar")
-        random_fill = remote.get_function("tvm.contrib.random.random_fill")
+    # Data size for DRAM needs to be larger than last level of cache. The
+    # cache levels sweep a small per-thread slice repeatedly so that every
+    # level moves about as many bytes as the DRAM measurement.
+    dram_size = 10**8 // (4 * threads * vec_width)
+    if tier_bytes is None:
+        size, reps = dram_size, 1
     else:
-        random_fill = get_global_func("tvm.contrib.random.random_fill")
-    assert random_fill, "Please make sure USE_RANDOM is ON in config.cmake"
-
-    threads = num_threads()
-    # Data size needs to be larger than last level of cache. We don't have a
-    # way of getting cache sizes, so this number should give us a large enough
-    # size.
-    size = 10**8 // (4 * threads * vec_width)
-    a = nd.empty((threads, size, 4, vec_width), dtype="float32", device=dev)
-    random_fill(a)
+        size = max(1, tier_bytes // (4 * 4 * vec_width))  # 4 rows of float32 vectors
+        reps = max(1, dram_size // size)
+    a = nd.empty((threads, size * 4 * vec_width + _BANDWIDTH_ROW_PADDING), "float32", dev)
+    # The values of `a` don't matter for a pure load sweep, so the parallel
+    # zero fill of the first-touch kernel is all the initialization it gets.
+    f["first_touch_tir"](a)
     b = nd.empty((threads, 4, vec_width), dtype="float32", device=dev)
     random_fill(b)
-    times = f.time_evaluator(f.entry_name, dev, repeat=10, number=1)(a, b, threads)
-    return a.numpy().size * 4 / times.min  # 4 bytes per float32
+    probe = "peak_bandwidth_tir" if tier_bytes is None else "peak_bandwidth_cached_tir"
+    times = f.time_evaluator(probe, dev, repeat=10, number=1)(a, b, size, reps)
+    # The padding is never read, so only count the blocks actually swept
+    return threads * size * 4 * vec_width * 4 * reps / times.min  # 4 bytes per float32
+
+
+def estimate_peak_bandwidth_dram(
+    target: Target,
+    dev: Device,
+    remote: Optional[RPCSession],
+    vec_width: Optional[int] = None,
+) -> float:
+    """Estimate peak bandwidth for DRAM. See estimate_peak_bandwidth."""
+    return estimate_peak_bandwidth_level(target, dev, remote, "DRAM", vec_width)
 
 
 @registry.estimate_peak_bandwidth.register("cpu")
@@ -283,7 +710,7 @@ def estimate_peak_bandwidth(
     dev: Device,
     remote: Optional[RPCSession],
     vec_width: Optional[int] = None,
-) -> Tuple[float, float, str]:
+) -> Tuple[float, float, str, Tuple[str, float]]:
     """Estimate peak memory bandwidth of a target/device combo.
 
     Peak bandwidth is estimated by running a small experiment on the underlying
@@ -316,16 +743,27 @@ def estimate_peak_bandwidth(
     peak_bandwidth : float
         Peak memory bandwidth in bytes/seconds.
     name : str
-        Name of the memory being used.
+        Name of the memory being used, always DRAM.
+    memory_level : Tuple[str, float]
+        Name of the memory level `func` fits in, one of L1, L2, L3 or DRAM,
+        and its peak bandwidth in bytes/seconds.
     """
-    # Ideally we'd be able to use this code to measure peak bandwidth of the
-    # different cache levels. If we could just generate load commands, then we
-    # could use those in a tight loop. Instead we need some code that is
-    # limited on the cache bandwidth. With the L1 cache we need an operation
-    # that has a very low arithmetic intensity and we haven't come up with one
-    # yet.
-    peak_bandwidth = estimate_peak_bandwidth_dram(target, dev, remote, vec_width)
     loaded_bytes = sum(
-        [np.sum(x) for (k, x) in features.items() if re.match(r"^B[0-9]+\.bytes$", k) is not None]
+        x.sum() for (k, x) in features.items() if _BUFFER_BYTES_RE.match(k) is not None
     )
-    return loaded_bytes, peak_bandwidth, "DRAM"
+    # Pick the smallest memory level that can hold everything `func` touches.
+    # L1 and L2 are private per core, so their capacity scales with the number
+    # of threads sharing the work, while the shared L3 holds its size in total.
+    threads = num_threads()
+    level = "DRAM"
+    for name, tier_bytes in _BANDWIDTH_TIERS:
+        if tier_bytes is None:
+            continue
+        if name not in _SHARED_BANDWIDTH_TIERS:
+            tier_bytes *= threads
+        if loaded_bytes <= tier_bytes:
+            level = name
+            break
+    peak_bandwidth = estimate_peak_bandwidth_dram(target, dev, remote, vec_width)
+    level_bandwidth = estimate_peak_bandwidth_level(target, dev, remote, level, vec_width)
+    return loaded_bytes, peak_bandwidth, "DRAM", (level, level_bandwidth)